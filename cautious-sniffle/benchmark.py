@@ -0,0 +1,204 @@
+"""
+Benchmark suite over the scenarios reported in the experiments.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --scenarios A B --output results/benchmarks/run.json
+    python benchmark.py --compare results/benchmarks/previous.json
+
+Every scenario is an ``assemble_model`` instance built from a fixed seed, for
+which the suite times model assembly, the first evaluation (graph lowering
+and compilation), single candidate and population evaluation and
+fixed-length PSO and DE runs. Results are written as JSON; with ``--compare``
+the ratios to a previous run are printed, values above 1 being slower.
+"""
+import argparse
+import json
+import os
+import platform
+import random as rd
+import subprocess
+import sys
+
+from datetime import datetime
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+
+from solver import *
+
+# scenario name: TOTAL_NOS given to assemble_model
+SCENARIOS = {"A": 5, "B": 6, "C": 7, "D": 8, "E": 9, "F": 10}
+
+SEED = 0
+T = 60
+REPEATS = 20
+POPULATION = 1_000
+PSO_SWARM = 100
+PSO_ITERATIONS = 20
+DE_POPULATION = 100
+DE_ITERATIONS = 20
+
+# metrics where larger is better, the others are times
+THROUGHPUT_METRICS = ("single_evaluations_per_second", "population_evaluations_per_second")
+
+
+def seed_everything(seed: int):
+    rd.seed(seed)
+    np.random.seed(seed)
+
+
+def time_call(function, repeats: int) -> float:
+    """Median wall time of ``repeats`` calls of ``function``."""
+    times = list()
+    for _ in range(repeats):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return median(times)
+
+
+def benchmark_scenario(name: str, args) -> dict:
+    print(f"Scenario {name}")
+    seed_everything(args.seed)
+    model, assembly_time = assemble_model(SCENARIOS[name], args.T)
+
+    candidates = model.clip_values(model.get_random_values(args.population))
+    single = candidates[:1]
+
+    start = perf_counter()
+    model.evaluate_population(single)
+    first_evaluation_time = perf_counter() - start
+
+    single_time = time_call(lambda: model.evaluate_population(single), args.repeats)
+    population_time = time_call(
+        lambda: model.evaluate_population(candidates), max(1, args.repeats // 4)
+    )
+
+    seed_everything(args.seed)
+    pso = ParticleSwarmOptimizer(
+        model,
+        num_particles=args.pso_swarm,
+        max_iterations=args.pso_iterations,
+        workers=1,
+    )
+    pso.optimize()
+
+    results = {
+        "total_nos": SCENARIOS[name],
+        "num_vars": model.num_vars,
+        "num_constrs": len(model._constraints),
+        "assembly_time": assembly_time,
+        "first_evaluation_time": first_evaluation_time,
+        "single_evaluation_time": single_time,
+        "single_evaluations_per_second": 1 / single_time,
+        "population_evaluation_time": population_time,
+        "population_evaluations_per_second": args.population / population_time,
+        "pso_time": pso.solve_time,
+        "pso_objective": float(sum(pso.solution.objective_values)),
+    }
+
+    for mode, vectorized in (("de", False), ("de_vectorized", True)):
+        seed_everything(args.seed)
+        de = DifferentialEvolutionOptimizer(
+            model,
+            num_individuals=args.de_population,
+            max_iterations=args.de_iterations,
+            vectorized=vectorized,
+            seed=args.seed,
+        )
+        de.optimize()
+        results[f"{mode}_time"] = de.solve_time
+        results[f"{mode}_objective"] = float(sum(de.solution.objective_values))
+
+    return results
+
+
+def metadata(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "T": args.T,
+        "repeats": args.repeats,
+        "population": args.population,
+        "pso_swarm": args.pso_swarm,
+        "pso_iterations": args.pso_iterations,
+        "de_population": args.de_population,
+        "de_iterations": args.de_iterations,
+    }
+
+
+def compare(current: dict, previous: dict):
+    print(f"\nRatios to {previous['metadata'].get('commit', '')[:10]} (> 1 is slower)")
+    for name, results in current["scenarios"].items():
+        old = previous["scenarios"].get(name)
+        if old is None:
+            continue
+
+        ratios = list()
+        for metric, value in results.items():
+            if metric.endswith("_time") and old.get(metric):
+                ratios.append(f"{metric[:-5]} {value / old[metric]:.2f}")
+            elif metric in THROUGHPUT_METRICS and value:
+                ratios.append(f"{metric} {old[metric] / value:.2f}")
+        print(f"{name}: " + ", ".join(ratios))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", default=None, help="JSON file to write")
+    parser.add_argument("--compare", default=None, help="previous JSON results")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--T", type=int, default=T)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--population", type=int, default=POPULATION)
+    parser.add_argument("--pso-swarm", type=int, default=PSO_SWARM)
+    parser.add_argument("--pso-iterations", type=int, default=PSO_ITERATIONS)
+    parser.add_argument("--de-population", type=int, default=DE_POPULATION)
+    parser.add_argument("--de-iterations", type=int, default=DE_ITERATIONS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    # assemble_model iterates over sets, whose order depends on string hashing
+    if os.environ.get("PYTHONHASHSEED") != str(SEED):
+        os.environ["PYTHONHASHSEED"] = str(SEED)
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    args = parse_arguments()
+    benchmark = {
+        "metadata": metadata(args),
+        "scenarios": {name: benchmark_scenario(name, args) for name in args.scenarios},
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = f"results/benchmarks/benchmark_{stamp}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(benchmark, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(benchmark, json.load(f))
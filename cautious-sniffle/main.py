@@ -21,6 +21,8 @@ DE_ITERATIONS = 10_000
 ## CONFIGURAÇÕES PARA MONTAGEM DO PROBLEMA
 T = 360
 DATA_PATH = f"data/{INSTANCE}"
+# simplifica as restrições antes de otimizar, muda o número de restrições
+PRESOLVE = False
 
 if __name__ == "__main__":
     if DATA_PATH:
@@ -30,23 +32,30 @@ if __name__ == "__main__":
     else:
         model, gen_time = assemble_model(10, T)
 
+    if PRESOLVE:
+        presolve = model.presolve()
+        print(
+            f"Presolve removed {len(presolve['removed'])} constraints, "
+            f"tightened {len(presolve['tightened'])} bounds, "
+            f"{len(presolve['infeasible'])} constraints cannot be satisfied"
+        )
+
     print("\nModel Statistics:")
     print(f"{len(model._variables)} variables")
     print(f"{len(model._constraints)} constraints")
     print(f"Created in {gen_time} seconds\n")
 
     if ENABLE_DE:
-        with RecursionLimiter(1_000):
-            print("\nDE Solution:")
-            de = DifferentialEvolutionOptimizer(
-                model,
-                max_iterations=DE_ITERATIONS,
-                num_individuals=DE_POPULATION,
-            )
-            de.optimize()
-            print("\nWith costs:")
-            pprint(de.solution.objective_values)
-            print(f"In {de.solve_time} seconds\n")
+        print("\nDE Solution:")
+        de = DifferentialEvolutionOptimizer(
+            model,
+            max_iterations=DE_ITERATIONS,
+            num_individuals=DE_POPULATION,
+        )
+        de.optimize()
+        print("\nWith costs:")
+        pprint(de.solution.objective_values)
+        print(f"In {de.solve_time} seconds\n")
 
         ## DE METRICS
         if PLOT:
@@ -83,17 +92,16 @@ if __name__ == "__main__":
                 fig.savefig(f"de_model_{INSTANCE}_{NUM_SKUS}_{T}_pen.png")
 
     if ENABLE_PSO:
-        with RecursionLimiter(1_000):
-            print("\nPSO Solution:")
-            pso = ParticleSwarmOptimizer(
-                model,
-                max_iterations=PSO_ITERATIONS,
-                num_particles=PSO_SWARM,
-            )
-            print("\nWith costs:")
-            pso.optimize()
-            pprint(pso.solution.objective_values)
-            print(f"In {pso.solve_time} seconds\n")
+        print("\nPSO Solution:")
+        pso = ParticleSwarmOptimizer(
+            model,
+            max_iterations=PSO_ITERATIONS,
+            num_particles=PSO_SWARM,
+        )
+        print("\nWith costs:")
+        pso.optimize()
+        pprint(pso.solution.objective_values)
+        print(f"In {pso.solve_time} seconds\n")
 
         ## PSO METRICS
         if PLOT:
@@ -0,0 +1,63 @@
+"""
+Run an experiment grid in parallel, caching the result of every run.
+
+Usage:
+    python run_grid.py
+    python run_grid.py --spec grid.json --cache results/cache --jobs 4
+
+Runs are keyed by a hash of the instance, the optimizer parameters and the
+seed, so running a partially finished grid again only computes the missing
+runs. The spec is a JSON object as described by ``solver.grid.expand_grid``,
+by default the one below.
+"""
+import argparse
+import json
+import os
+import sys
+
+from solver.grid import ResultCache, expand_grid, run_grid
+
+SEED = 0
+GRID = {
+    "optimizer": ["pso", "de"],
+    "scenario": [5, 6, 7, 8, 9, 10],
+    "T": 60,
+    "iterations": [100, 1_000],
+    "population": [100],
+    "repetitions": 10,
+    "seed": SEED,
+    "options": {"pso": {"workers": 1}, "de": {"vectorized": True}},
+}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--spec", default=None, help="JSON grid spec")
+    parser.add_argument("--cache", default="results/cache", help="results directory")
+    parser.add_argument("--jobs", type=int, default=None, help="concurrent runs")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    # generated instances iterate over sets, whose order depends on string hashing
+    if os.environ.get("PYTHONHASHSEED") != str(SEED):
+        os.environ["PYTHONHASHSEED"] = str(SEED)
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    args = parse_arguments()
+    spec = GRID
+    if args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+
+    cache = ResultCache(args.cache)
+    keys = run_grid(spec, cache, args.jobs)
+    for run, key in zip(expand_grid(spec), keys):
+        results = cache.load(key)
+        print(
+            f"{run['optimizer']} scenario {run['scenario']} {run['iterations']}it "
+            f"seed {run['seed']}: {sum(results['objectives']):.6g} "
+            f"in {results['solve_time']:.2f}s"
+        )
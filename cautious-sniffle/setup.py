@@ -12,6 +12,7 @@ setup(
     packages=["solver"],
     install_requires=[
         "numpy",
+        "scipy",
         "tqdm",
         "seaborn",
         "matplotlib",
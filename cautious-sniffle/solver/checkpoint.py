@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import json
+import os
+import random as rd
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+
+def random_states(generator: np.random.Generator | None = None) -> dict:
+    """
+    States of the ``random`` module, of the global NumPy generator and of
+    ``generator``, in a JSON serializable form.
+    """
+    version, internal, gauss = rd.getstate()
+    name, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    states = {
+        "random": [version, list(internal), gauss],
+        "numpy": [name, keys.tolist(), int(position), int(has_gauss), float(cached_gaussian)],
+    }
+    if generator is not None:
+        states["generator"] = generator.bit_generator.state
+
+    return states
+
+
+def restore_random_states(states: dict, generator: np.random.Generator | None = None):
+    version, internal, gauss = states["random"]
+    rd.setstate((version, tuple(internal), gauss))
+
+    name, keys, position, has_gauss, cached_gaussian = states["numpy"]
+    np.random.set_state(
+        (name, np.array(keys, dtype=np.uint32), position, has_gauss, cached_gaussian)
+    )
+
+    if generator is not None and "generator" in states:
+        generator.bit_generator.state = states["generator"]
+
+
+def save_checkpoint(path: str, arrays: dict[str, np.ndarray], metadata: dict):
+    """
+    Write ``arrays`` and the JSON ``metadata`` to a compressed ``.npz``
+    file. The file is replaced atomically, so a crash while writing leaves
+    the previous checkpoint intact.
+    """
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        np.savez_compressed(f, metadata=np.array(json.dumps(metadata)), **arrays)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path: str) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    :return: arrays and metadata of a checkpoint written by
+        :func:`save_checkpoint`
+    :rtype: tuple[dict[str, np.ndarray], dict]
+    """
+    with np.load(path, allow_pickle=False) as data:
+        metadata = json.loads(str(data["metadata"]))
+        arrays = {name: data[name] for name in data.files if name != "metadata"}
+
+    return arrays, metadata
+
+
+def recording_state(
+    evolution_data: list, recorder, writer: CheckpointWriter
+) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    State of what an optimizer recorded so far, either the ``evolution_data``
+    list, kept by ``writer`` in its history file, or the state of its
+    ``recorder``.
+    """
+    if recorder is None:
+        return dict(), {"recorder": None, "history": writer.history(evolution_data)}
+
+    arrays, metadata = recorder.checkpoint_state()
+    arrays = {f"recorder_{name}": array for name, array in arrays.items()}
+    return arrays, {"recorder": type(recorder).__name__, "recorder_state": metadata}
+
+
+def load_history(history: dict) -> np.ndarray:
+    """
+    :return: the iterations of a history file, as described in a checkpoint
+        by :meth:`CheckpointWriter.history`
+    :rtype: np.ndarray
+    """
+    if history["shape"] is None:
+        return np.empty(0)
+
+    shape = (history["iterations"],) + tuple(history["shape"])
+    count = int(np.prod(shape))
+    data = np.fromfile(history["path"], dtype=np.float64, count=count)
+    if len(data) < count:
+        raise ValueError(
+            f"{history['path']} holds fewer than {history['iterations']} iterations."
+        )
+    return data.reshape(shape)
+
+
+def restore_recording(
+    arrays: dict[str, np.ndarray], metadata: dict, evolution_data: list, recorder
+):
+    kind = None if recorder is None else type(recorder).__name__
+    if kind != metadata["recorder"]:
+        raise ValueError(
+            f"Checkpoint was recorded by {metadata['recorder']}, not by {kind}."
+        )
+
+    if recorder is None:
+        evolution_data[:] = load_history(metadata["history"]).tolist()
+    else:
+        recorder.restore_checkpoint_state(
+            {
+                name[len("recorder_") :]: array
+                for name, array in arrays.items()
+                if name.startswith("recorder_")
+            },
+            metadata["recorder_state"],
+        )
+
+
+def _append_history(path: str, chunks: list[tuple[int, np.ndarray]]):
+    for offset, rows in chunks:
+        # a resumed run overwrites what was written past its checkpoint
+        with open(path, "r+b" if offset and os.path.exists(path) else "wb") as f:
+            f.seek(offset * rows[0].nbytes if len(rows) else 0)
+            f.write(rows.tobytes())
+            f.truncate()
+
+
+def _write_checkpoint(
+    path: str,
+    arrays: dict[str, np.ndarray],
+    metadata: dict,
+    history_path: str,
+    chunks: list[tuple[int, np.ndarray]],
+):
+    _append_history(history_path, chunks)
+    save_checkpoint(path, arrays, metadata)
+
+
+class CheckpointWriter:
+    """
+    Writes checkpoints every ``every`` iterations in a background thread.
+
+    The arrays are copied when a checkpoint is requested, so the optimizer
+    may keep updating them while the copy is compressed and written. Only one
+    write is pending at a time: a new checkpoint waits for the previous one.
+    Without a path no checkpoint is ever due.
+
+    Evolution data given to :meth:`history` is appended to a history file
+    shared by the checkpoints, ``.evolution`` next to them, so that every
+    checkpoint only writes the iterations added since the previous one.
+
+    :param path: checkpoint file, ``{iteration}`` is replaced by the
+        iteration number when present
+    :type path: str | None
+    :param every: iterations between checkpoints
+    :type every: int
+    """
+
+    def __init__(self, path: str | None, every: int = 100) -> None:
+        self.path = path
+        self.every = every
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: Future | None = None
+
+        # iterations given to history, and those still to be appended
+        self._history_rows = 0
+        self._history_shape: list[int] | None = None
+        self._history_chunks: list[tuple[int, np.ndarray]] = list()
+
+    def __enter__(self) -> CheckpointWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def due(self, iteration: int) -> bool:
+        return self.path is not None and self.every > 0 and iteration % self.every == 0
+
+    @property
+    def history_path(self) -> str:
+        stem = os.path.splitext(self.path.replace("{iteration}", ""))[0]
+        return os.path.abspath(stem + ".evolution")
+
+    def history(self, evolution_data: list) -> dict:
+        """
+        Queue the iterations of ``evolution_data`` added since the previous
+        call, to be appended to the history file by the next :meth:`write`.
+
+        :param evolution_data: values of every candidate, by iteration
+        :type evolution_data: list
+        :return: where the history is and how many iterations it holds, see
+            :func:`load_history`
+        :rtype: dict
+        """
+        rows = len(evolution_data)
+        if rows < self._history_rows:
+            self._history_rows = 0
+        if rows > self._history_rows:
+            added = np.array(evolution_data[self._history_rows :], dtype=np.float64)
+            self._history_chunks.append((self._history_rows, added))
+            self._history_shape = list(added.shape[1:])
+            self._history_rows = rows
+
+        return {
+            "path": self.history_path,
+            "iterations": rows,
+            "shape": self._history_shape if rows else None,
+        }
+
+    def write(self, iteration: int, arrays: dict[str, np.ndarray], metadata: dict):
+        self.wait()
+        snapshot = {name: np.array(array, copy=True) for name, array in arrays.items()}
+        chunks, self._history_chunks = self._history_chunks, list()
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        path = self.path.format(iteration=iteration)
+        self._pending = self._executor.submit(
+            _write_checkpoint, path, snapshot, metadata, self.history_path, chunks
+        )
+
+    def wait(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import numpy as np
+import operator as op
+
+from .expression import _batched_operation
+from .graph import ExpressionGraph
+
+# operators translated to plain NumPy infix expressions
+_INFIX = {
+    op.add: "+",
+    op.sub: "-",
+    op.mul: "*",
+    op.lt: "<",
+    op.le: "<=",
+    op.eq: "==",
+    op.ge: ">=",
+    op.gt: ">",
+}
+
+# terms added per line when unrolling sums
+_SUM_CHUNK = 32
+
+
+def _power(base, exponent):
+    return _batched_operation(op.pow, base, exponent)
+
+
+def _fractional_power(base, exponent):
+    # exponent is a non integer constant, only negative bases turn complex
+    if np.iscomplexobj(base) or np.any(base < 0):
+        return np.power(base.astype(complex), exponent)
+    return np.power(base, exponent)
+
+
+def _divide(left, right):
+    return np.where(np.equal(right, 0), np.inf, left / right)
+
+
+def _floor_divide(left, right):
+    return np.where(np.equal(right, 0), np.inf, left // right)
+
+
+class CompiledGraph:
+    """
+    Straight-line Python/NumPy function computing some nodes of an
+    :class:`ExpressionGraph`.
+
+    Every node becomes one assignment of the generated source, constants and
+    coefficient arrays are bound as globals of the function, and operations
+    between constants are folded while compiling. Calling the compiled graph
+    gives the same results as ``graph.evaluate(values, outputs)``.
+
+    The generated function cannot be pickled; :class:`Model` drops it when
+    pickled and compiles it again on first use.
+
+    :param graph: graph to compile
+    :type graph: ExpressionGraph
+    :param outputs: ids of the nodes returned by the function
+    :type outputs: list[int]
+    """
+
+    def __init__(self, graph: ExpressionGraph, outputs: list[int]) -> None:
+        self.outputs = list(outputs)
+        self._namespace: dict = {
+            "np": np,
+            "_power": _power,
+            "_fractional_power": _fractional_power,
+            "_divide": _divide,
+            "_floor_divide": _floor_divide,
+        }
+        self._constants: dict[int, object] = dict()
+        self.source = self._generate(graph)
+
+        code = compile(self.source, "<compiled model>", "exec")
+        exec(code, self._namespace)
+        self._function = self._namespace["evaluate"]
+
+    def __call__(self, values: np.ndarray) -> list:
+        """
+        :param values: (population x num_vars) matrix of variable values
+        :type values: np.ndarray
+        :return: one value per candidate of every output node, or a scalar
+            for constant nodes
+        :rtype: list
+        """
+        return self._function(values)
+
+    def _name(self, node: int) -> str:
+        if node in self._constants:
+            return f"c{node}"
+        return f"n{node}"
+
+    def _bind(self, name: str, value) -> str:
+        self._namespace[name] = value
+        return name
+
+    def _generate(self, graph: ExpressionGraph) -> str:
+        lines = [
+            "def evaluate(values):",
+            "    with np.errstate(all='ignore'):",
+        ]
+        body = list()
+
+        for node, releases in graph._schedule(tuple(self.outputs)):
+            key = graph._nodes[node]
+            kind = key[0]
+
+            if kind == "const":
+                self._constants[node] = key[2]
+                self._bind(f"c{node}", key[2])
+            elif kind == "var":
+                body.append(f"n{node} = values[..., {key[1]}]")
+            elif kind == "linear":
+                indexes, weights = graph._linear_arrays[node]
+                self._bind(f"i{node}", indexes)
+                self._bind(f"w{node}", weights)
+                self._bind(f"k{node}", key[3])
+                body.append(f"n{node} = values[..., i{node}] @ w{node} + k{node}")
+            elif kind == "sum":
+                body.extend(self._generate_sum(node, key[1]))
+            elif kind == "opaque":
+                self._bind(f"o{node}", graph._opaque[key[1]])
+                body.append(f"n{node} = np.asarray(o{node}.evaluate(values))")
+            else:
+                body.extend(self._generate_operation(node, kind, key[1], key[2]))
+
+            released = [f"n{child}" for child in releases if child not in self._constants]
+            if released:
+                body.append("del " + ", ".join(released))
+
+        results = ", ".join(self._name(node) for node in self.outputs)
+        body.append(f"return [{results}]")
+
+        lines.extend("        " + line for line in body)
+        return "\n".join(lines) + "\n"
+
+    def _generate_operation(self, node: int, operator, left: int, right: int) -> list[str]:
+        if left in self._constants and right in self._constants:
+            value = _batched_operation(
+                operator, self._constants[left], self._constants[right]
+            )
+            self._constants[node] = value
+            self._bind(f"c{node}", value)
+            return list()
+
+        left_name = self._name(left)
+        right_name = self._name(right)
+
+        if operator in _INFIX:
+            expression = f"{left_name} {_INFIX[operator]} {right_name}"
+        elif operator is op.pow and right in self._constants:
+            exponent = self._constants[right]
+            if np.iscomplexobj(exponent):
+                expression = f"_power({left_name}, {right_name})"
+            elif exponent == np.floor(exponent):
+                expression = f"np.power({left_name}, {right_name})"
+            else:
+                expression = f"_fractional_power({left_name}, {right_name})"
+        elif operator is op.pow:
+            expression = f"_power({left_name}, {right_name})"
+        elif operator is op.truediv:
+            if right in self._constants and self._constants[right] != 0:
+                expression = f"{left_name} / {right_name}"
+            else:
+                expression = f"_divide({left_name}, {right_name})"
+        elif operator is op.floordiv:
+            expression = f"_floor_divide({left_name}, {right_name})"
+        else:
+            function = self._bind(f"f{node}", operator)
+            expression = f"{function}({left_name}, {right_name})"
+
+        return [f"n{node} = {expression}"]
+
+    def _generate_sum(self, node: int, children: tuple[int, ...]) -> list[str]:
+        if all(child in self._constants for child in children):
+            value = 0
+            for child in children:
+                value = _batched_operation(op.add, value, self._constants[child])
+            self._constants[node] = value
+            self._bind(f"c{node}", value)
+            return list()
+
+        # terms are added in order, as the graph does, and split in several
+        # lines since a long single expression nests too deep for the compiler
+        lines = list()
+        previous = ["0"]
+        terms = [self._name(child) for child in children]
+        for start in range(0, len(terms), _SUM_CHUNK):
+            lines.append(
+                f"n{node} = " + " + ".join(previous + terms[start : start + _SUM_CHUNK])
+            )
+            previous = [f"n{node}"]
+        return lines
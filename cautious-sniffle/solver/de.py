@@ -4,57 +4,146 @@ import numpy as np
 from tqdm import tqdm
 from time import time
 
+from .checkpoint import (
+    CheckpointWriter,
+    load_checkpoint,
+    random_states,
+    recording_state,
+    restore_random_states,
+    restore_recording,
+)
+from .incremental import IncrementalEvaluator
 from .model import Model
-from .expression import Expression
-from .variables import  BinVariable, IntVariable, RealVariable
+from .penalties import max_normalized_penalties
+from .profiling import PhaseProfiler
+from .stopping import StoppingRules
+
+# a penalty above -FEASIBILITY_TOLERANCE means no constraint is violated
+FEASIBILITY_TOLERANCE = 0.000001
+
+# below this crossover rate trial vectors keep most coordinates of their
+# individual and are evaluated incrementally, one individual at a time
+INCREMENTAL_CROSSOVER_RATE = 0.5
+
+
+def _rank_triplets(
+    objectives: np.ndarray, penalties: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    NDE ranking of triplets of individuals into best, better and worst.
+
+    Feasible individuals rank above infeasible ones; feasible individuals are
+    ranked by objective and infeasible ones by penalty. When all three share
+    feasibility they are ranked by objective.
+
+    :param objectives: (n x 3) objective sums of each triplet
+    :type objectives: np.ndarray
+    :param penalties: (n x 3) constraint violation penalties of each triplet
+    :type penalties: np.ndarray
+    :return: positions (0, 1 or 2) of best, better and worst in each triplet
+    :rtype: tuple[np.ndarray, np.ndarray, np.ndarray]
+    """
+    feasible = penalties >= -FEASIBILITY_TOLERANCE
+    num_feasible = feasible.sum(axis=1)
+
+    best = np.argmax(objectives, axis=1)
+    worst = np.argmin(objectives, axis=1)
+    tied = best == worst
+    best[tied] = 0
+    worst[tied] = 2
+
+    two = num_feasible == 2
+    best[two] = np.argmax(np.where(feasible, objectives, -np.inf), axis=1)[two]
+    worst[two] = np.argmin(feasible, axis=1)[two]
+
+    one = num_feasible == 1
+    best[one] = np.argmax(feasible, axis=1)[one]
+    better_one = np.argmax(np.where(feasible, -np.inf, penalties), axis=1)
+    worst[one] = 3 - best[one] - better_one[one]
+
+    better = 3 - best - worst
+    return best, better, worst
+
 
 class Individual:
-    def __init__(self, model: Model) -> None:
+    def __init__(self, model: Model, position: np.ndarray) -> None:
+        """
+        An individual only holds its position; the model, shared by the whole
+        population, is used read-only to evaluate it.
+
+        :param model: Model being solved
+        :type model: Model
+        :param position: row of the population positions matrix
+        :type position: np.ndarray
+        """
         self._current_gen = 1
         self._model = model
-        self.mutant_vector: dict[BinVariable | IntVariable | RealVariable, float] = dict()
+        self.position = position
+        self.mutant_vector = position.copy()
 
     def initialize_variables(self):
-        self._model.set_random_variables_values()
+        self.position[:] = self._model.get_random_values()
 
     def calculate_mutant_vector(
         self,
         generation: int,
         cr: float,
-        x_c: dict[BinVariable | IntVariable | RealVariable, float],
-        x_best: dict[BinVariable | IntVariable | RealVariable, float],
-        x_better: dict[BinVariable | IntVariable | RealVariable, float],
-        x_worst: dict[BinVariable | IntVariable | RealVariable, float],
+        x_c: np.ndarray,
+        x_best: np.ndarray,
+        x_better: np.ndarray,
+        x_worst: np.ndarray,
     ):
         self._current_gen = generation
         f1 = rd.uniform(0, 1)
         f2 = rd.uniform(0, 1)
         f3 = rd.uniform(0, 1)
 
-        def mutate(var):
-            return (
-                x_c[var]
-                + f1 * (x_best[var] - x_better[var])
-                + f2 * (x_best[var] - x_worst[var])
-                + f3 * (x_better[var] - x_worst[var])
-            )
-
-        mutant_vector = {var: mutate(var) for var in x_c}
-        selected_var = rd.sample(list(mutant_vector.keys()), 1)
+        mutant_vector = (
+            x_c
+            + f1 * (x_best - x_better)
+            + f2 * (x_best - x_worst)
+            + f3 * (x_better - x_worst)
+        )
 
-        for var in mutant_vector:
-            if rd.uniform(0, 1) < cr or var == selected_var:
-                self.mutant_vector[var] = mutant_vector[var]
+        crossover = np.random.uniform(0, 1, len(mutant_vector)) < cr
+        crossover[rd.randrange(len(mutant_vector))] = True
+        self.mutant_vector = np.where(crossover, mutant_vector, self.position)
 
-    def update_variables(self):
-        current_objective = sum(self._model.objective_values[:-1])
-        current_variable_values = self._model.variables_values
+    def update_variables(
+        self,
+        current_objectives: list[float],
+        evaluator: IncrementalEvaluator | None = None,
+        row: int | None = None,
+    ) -> list[float]:
+        """
+        Greedy selection between the current position and the mutant vector.
+
+        :param current_objectives: objective values of the current position
+        :type current_objectives: list[float]
+        :param evaluator: evaluator of the population, holding this
+            individual at ``row``; only what depends on the coordinates taken
+            from the mutant vector is then evaluated again
+        :type evaluator: IncrementalEvaluator | None
+        :param row: row of the individual in ``evaluator``
+        :type row: int | None
+        :return: objective values of the selected position
+        :rtype: list[float]
+        """
+        candidate = self._model.clip_values(self.mutant_vector)
+        if evaluator is None:
+            objectives, _ = self._model.evaluate_population(candidate)
+            candidate_objectives = objectives[0].tolist()
+        else:
+            objectives, _ = evaluator.peek(row, candidate)
+            candidate_objectives = objectives.tolist()
 
-        self._model.set_variables_values(self.mutant_vector)
-        candidate_objective = sum(self._model.objective_values[:-1])
+        if sum(candidate_objectives) < sum(current_objectives):
+            return current_objectives
 
-        if candidate_objective < current_objective:
-            self._model.set_variables_values(current_variable_values)
+        if evaluator is not None:
+            evaluator.update(row, candidate)
+        self.position[:] = candidate
+        return candidate_objectives
 
 
 class DifferentialEvolutionOptimizer:
@@ -64,12 +153,37 @@ class DifferentialEvolutionOptimizer:
         num_individuals: int = 100,
         max_iterations: int = 10000,
         crossover_rate: float = 0.95,
+        vectorized: bool = False,
+        seed: int | None = None,
+        recorder=None,
     ) -> None:
+        """
+        :param model: Model being solved
+        :type model: Model
+        :param num_individuals: population size, at least 5
+        :type num_individuals: int
+        :param max_iterations: number of generations
+        :type max_iterations: int
+        :param crossover_rate: probability of taking each mutant coordinate
+        :type crossover_rate: float
+        :param vectorized: evolve the whole generation at once instead of one
+            individual at a time; trial vectors then only see the population
+            of the previous generation
+        :type vectorized: bool
+        :param seed: seed of the generator used by the vectorized mode
+        :type seed: int | None
+        :param recorder: stores the evolution data instead of the
+            ``evolution_data`` list, e.g. an EvolutionFileRecorder
+        :type recorder: EvolutionFileRecorder | None
+        """
         self._model = model
 
         self.num_individuals = max(5, num_individuals)
         self.max_iterations = max_iterations
         self.crossover_rate = crossover_rate
+        self.vectorized = vectorized
+        self.recorder = recorder
+        self._rng = np.random.default_rng(seed)
 
         p1 = 1
         p2 = rd.uniform(0.75, 1)
@@ -80,53 +194,87 @@ class DifferentialEvolutionOptimizer:
         self.w2 = p2 / p_sum
         self.w3 = p3 / p_sum
 
-        self._population = [
-            Individual(model.copy())
-            for _ in tqdm(
-                range(self.num_individuals), desc="Creating population", position=0
-            )
-        ]
+        self.profile = PhaseProfiler()
+        with self.profile.phase("population_creation"):
+            self._positions = np.empty((self.num_individuals, model.num_vars))
+            self._population = [
+                Individual(model, self._positions[i])
+                for i in tqdm(
+                    range(self.num_individuals), desc="Creating population", position=0
+                )
+            ]
 
+        self._objectives = np.empty((self.num_individuals, 0))
+        self._violations = np.empty((self.num_individuals, 0))
+        self._penalties = np.zeros(self.num_individuals)
+        self._objective_values: list[list[float]] = list()
+        self._evaluator: IncrementalEvaluator | None = None
         self.evolution_data: list[list[list[float]]] = list()
         self.solve_time = None
         self.solution = self._model
-
-    def _evatuate_constraint_violation_penalties(self):
-        def cv(individual: Individual):
-            def cvj(gj: Expression):
-                try:
-                    val = gj.value
-                except AttributeError:
-                    val = gj
-                try:
-                    ret_val = max(0.0, val)
-                except TypeError:
-                    ret_val = max(0.0, np.absolute(val))
-                return ret_val
-
-            return [cvj(gj) for gj in individual._model._constraints]
-
-        violations = [cv(indi) for indi in self._population]
-        transposed_violations = list(map(list, zip(*violations)))
-        max_violations = [
-            max(constraint_j_viol) for constraint_j_viol in transposed_violations
+        self.stop_reason: str | None = None
+        # fitness, position and penalty, the negated total violation, replaced
+        # at once so that another thread always reads a consistent best
+        self._best: tuple[float, np.ndarray, float] = (
+            -np.inf,
+            np.zeros(model.num_vars),
+            0.0,
+        )
+
+    @property
+    def best_fitness(self) -> float:
+        return self._best[0]
+
+    @property
+    def best_position(self) -> np.ndarray:
+        return self._best[1]
+
+    def best_solution(self) -> Model:
+        """
+        Best individual evaluated so far, available at any moment of the run.
+        It is scored by the objectives minus the total violation, and may
+        differ from the result of :meth:`optimize`, chosen under the
+        penalties normalized over the final population.
+
+        :return: copy of the model holding its values
+        :rtype: Model
+        """
+        _, position, penalty = self._best
+        solution = self._model.copy()
+        solution.set_values_vector(position)
+        solution.set_constraint_violation_penalty(penalty)
+        return solution
+
+    def _evaluate_population(self):
+        """
+        Evaluate every individual in a single batched call, caching their
+        objective values followed by the constraint violation penalty.
+        """
+        with self.profile.phase("evaluation"):
+            objectives, violations = self._model.evaluate_population(self._positions)
+        self.profile.count_evaluations(self.num_individuals)
+        self._set_population_values(objectives, violations)
+
+    def _set_population_values(self, objectives: np.ndarray, violations: np.ndarray):
+        with self.profile.phase("penalty"):
+            penalties = self._evatuate_constraint_violation_penalties(violations)
+
+        self._objectives = objectives
+        self._violations = violations
+        self._penalties = penalties
+        self._objective_values = [
+            objs + [penalty]
+            for objs, penalty in zip(objectives.tolist(), penalties.tolist())
         ]
 
-        for index in range(self.num_individuals):
-            individual_violation = violations[index]
-            total_constraints = len(individual_violation)
-            penalty = (
-                -1
-                * sum(
-                    [
-                        a / b
-                        for a, b in zip(individual_violation, max_violations)
-                        if b != 0
-                    ]
-                )
-                / total_constraints
-            )
-            self._population[index]._model.set_constraint_violation_penalty(penalty)
+    def _evatuate_constraint_violation_penalties(self, violations: np.ndarray) -> np.ndarray:
+        return max_normalized_penalties(violations)
+
+    def _record(self, obj_pool: list[list[float]]):
+        if self.recorder is None:
+            self.evolution_data.append(obj_pool)
+        else:
+            self.recorder.record(obj_pool)
 
     @staticmethod
     def _calculate_tolerance(tolerance):
@@ -137,95 +285,345 @@ class DifferentialEvolutionOptimizer:
 
     def _evaluate_xc(
         self,
-        x_best: dict[BinVariable | IntVariable | RealVariable, float],
-        x_better: dict[BinVariable | IntVariable | RealVariable, float],
-        x_worst: dict[BinVariable | IntVariable | RealVariable, float],
+        x_best: np.ndarray,
+        x_better: np.ndarray,
+        x_worst: np.ndarray,
     ):
-        def xc(var):
-            return (
-                self.w1 * (x_best[var] - x_better[var])
-                + self.w2 * (x_best[var] - x_worst[var])
-                + self.w3 * (x_better[var] - x_worst[var])
-            )
-
-        return {var: xc(var) for var in x_best}
+        return (
+            self.w1 * (x_best - x_better)
+            + self.w2 * (x_best - x_worst)
+            + self.w3 * (x_better - x_worst)
+        )
 
     def _determine_best_better_worst(self):
         selected = rd.sample(range(len(self._population)), 3)
-        individuals = [self._population[x] for x in selected]
-        objectives = [ind._model.objective_values for ind in individuals]
-        feasibles = [int(bool(obj[-1] >= 0.000001)) for obj in objectives]
-
-        if sum(feasibles) == 3:
-            total_objs = [sum(obj[:-1]) for obj in objectives]
-            ids = [0, 1, 2]
-            best_idx = total_objs.index(max(total_objs))
-            worst_idx = total_objs.index(min(total_objs))
-            better_idx = (set(ids) - set([best_idx, worst_idx])).pop()
-        elif sum(feasibles) == 2:
-            total_objs = [sum(obj[:-1]) for obj in objectives]
-            ids = [0, 1, 2]
-            worst_idx = feasibles.index(False)
-            best_idx = ids[0] if total_objs[ids[0]] > total_objs[ids[0]] else ids[1]
-            better_idx = (set(ids) - set([best_idx, worst_idx])).pop()
-        elif sum(feasibles) == 1:
-            penalty = [obj[-1] for obj in objectives]
-            ids = [0, 1, 2]
-            best_idx = feasibles.index(True)
-            better_idx = ids[0] if penalty[ids[0]] < penalty[ids[0]] else ids[1]
-            worst_idx = (set(ids) - set([best_idx, better_idx])).pop()
-        else:
-            total_objs = [sum(obj[:-1]) for obj in objectives]
-            ids = [0, 1, 2]
-            best_idx = total_objs.index(max(total_objs))
-            worst_idx = total_objs.index(min(total_objs))
-            if best_idx == worst_idx:
-                better_idx = 1
-                worst_idx = 2
-            else:
-                better_idx = (set(ids) - set([best_idx, worst_idx])).pop()
-
-        x_best = individuals[best_idx]._model.variables_values
-        x_better = individuals[better_idx]._model.variables_values
-        x_worst = individuals[worst_idx]._model.variables_values
+        objectives = [self._objective_values[x] for x in selected]
+        totals = np.array([[sum(obj[:-1]) for obj in objectives]])
+        penalties = np.array([[obj[-1] for obj in objectives]])
+        best_idx, better_idx, worst_idx = (
+            int(column[0]) for column in _rank_triplets(totals, penalties)
+        )
+
+        x_best = self._positions[selected[best_idx]].copy()
+        x_better = self._positions[selected[better_idx]].copy()
+        x_worst = self._positions[selected[worst_idx]].copy()
 
         return x_best, x_better, x_worst
 
-    def optimize(self, tolerance=5):
+    def _sample_triplets(self) -> np.ndarray:
+        """
+        Draw, for every individual, three distinct individuals of the
+        population.
+
+        :return: (num_individuals x 3) matrix of indexes
+        :rtype: np.ndarray
+        """
+        size = self.num_individuals
+        first = self._rng.integers(0, size, size)
+        second = self._rng.integers(0, size - 1, size)
+        second += second >= first
+
+        low = np.minimum(first, second)
+        high = np.maximum(first, second)
+        third = self._rng.integers(0, size - 2, size)
+        third += third >= low
+        third += third >= high
+
+        return np.column_stack([first, second, third])
+
+    def _evolve_generation(self, cr: float):
+        """
+        Mutation, crossover and greedy selection of the whole population at
+        once, every trial vector built from the population at the start of
+        the generation.
+
+        :param cr: crossover rate
+        :type cr: float
+        """
+        size, num_vars = self._positions.shape
+        rows = np.arange(size)
+        totals = self._objectives.sum(axis=1)
+        profile = self.profile
+
+        with profile.phase("selection"):
+            triplets = self._sample_triplets()
+            best, better, worst = _rank_triplets(
+                totals[triplets], self._penalties[triplets]
+            )
+
+        with profile.phase("update"):
+            x_best = self._positions[triplets[rows, best]]
+            x_better = self._positions[triplets[rows, better]]
+            x_worst = self._positions[triplets[rows, worst]]
+
+            # x_c plus the randomly scaled differences, f1, f2 and f3 per individual
+            f1, f2, f3 = self._rng.uniform(0, 1, (3, size, 1))
+            mutants = (
+                (self.w1 + f1) * (x_best - x_better)
+                + (self.w2 + f2) * (x_best - x_worst)
+                + (self.w3 + f3) * (x_better - x_worst)
+            )
+
+            crossover = self._rng.uniform(0, 1, (size, num_vars)) < cr
+            crossover[rows, self._rng.integers(0, num_vars, size)] = True
+            trials = self._model.clip_values(
+                np.where(crossover, mutants, self._positions)
+            )
+
+        with profile.phase("evaluation"):
+            trial_objectives, trial_violations = self._model.evaluate_population(trials)
+        profile.count_evaluations(size)
+
+        with profile.phase("selection"):
+            accepted = trial_objectives.sum(axis=1) >= totals
+            self._positions[accepted] = trials[accepted]
+            objectives = self._objectives.copy()
+            objectives[accepted] = trial_objectives[accepted]
+            violations = self._violations.copy()
+            violations[accepted] = trial_violations[accepted]
+
+        self._set_population_values(objectives, violations)
+
+    def optimize(
+        self,
+        tolerance=5,
+        checkpoint: str | None = None,
+        checkpoint_every: int = 100,
+        resume_from: str | None = None,
+        stopping: StoppingRules | None = None,
+    ):
+        """
+        :param tolerance: initial tolerance, decreased every generation
+        :type tolerance: float
+        :param checkpoint: file where the state of the run is saved every
+            ``checkpoint_every`` generations, ``{iteration}`` is replaced by
+            the generation number; without a recorder, the evolution data is
+            kept in a single ``.evolution`` file next to the checkpoints
+        :type checkpoint: str | None
+        :param checkpoint_every: generations between checkpoints
+        :type checkpoint_every: int
+        :param resume_from: checkpoint to continue from, the optimizer must
+            be built with the same model, population size, mode and
+            recorder type
+        :type resume_from: str | None
+        :param stopping: time limit, target and stagnation rules, checked
+            every generation; the cause of stopping is kept in ``stop_reason``
+        :type stopping: StoppingRules | None
+        """
         start_time = time()
         cr = self.crossover_rate
 
-        for individual in self._population:
-            individual.initialize_variables()
+        profile = self.profile
+        if stopping is not None:
+            stopping.start()
+        self.stop_reason = "max_iterations"
 
-        self._evatuate_constraint_violation_penalties()
-        for gen in tqdm(range(self.max_iterations), desc="Generation", position=1):
-            tolerance = self._calculate_tolerance(tolerance)
+        first_gen = 0
+        elapsed = 0.0
+        if resume_from is not None:
+            first_gen, elapsed, tolerance = self._restore_checkpoint(resume_from, stopping)
+        else:
+            with profile.phase("population_creation"):
+                for individual in self._population:
+                    individual.initialize_variables()
+
+            self._evaluate_population()
+            self._update_best()
+
+        with CheckpointWriter(checkpoint, checkpoint_every) as writer:
+            for gen in tqdm(
+                range(first_gen, self.max_iterations),
+                desc="Generation",
+                position=1,
+                initial=first_gen,
+                total=self.max_iterations,
+            ):
+                tolerance = self._calculate_tolerance(tolerance)
+                self._run_generation(gen, cr)
+                with profile.phase("selection"):
+                    self._update_best()
+
+                action = None
+                if stopping is not None:
+                    stopping.update(self.best_fitness)
+                    action = stopping.check()
+                    if action == "restart":
+                        self._restart_individuals(stopping.worst(self._fitness()))
+
+                if writer.due(gen + 1):
+                    with profile.phase("recording"):
+                        self._write_checkpoint(
+                            writer,
+                            gen + 1,
+                            elapsed + time() - start_time,
+                            tolerance,
+                            stopping,
+                        )
+
+                if action == "stop":
+                    self.stop_reason = stopping.reason
+                    break
+
+        if self.recorder is not None:
+            self.recorder.close()
+
+        # the result is the best of the final population under its normalized
+        # penalty, the best so far only serves the stopping rules
+        with profile.phase("selection"):
+            best_ind = 0
+            best_obj = sum(self._objective_values[best_ind])
+            for j in range(self.num_individuals):
+                obj = self._objective_values[j]
+                if sum(obj) > best_obj:
+                    best_ind = j
+                    best_obj = sum(self._objective_values[best_ind])
+
+        solution = self._model.copy()
+        solution.set_values_vector(self._positions[best_ind])
+        solution.set_constraint_violation_penalty(self._objective_values[best_ind][-1])
 
-            obj_pool = list()
-            for individual in tqdm(self._population, desc="Individual", position=0, leave=False):
-                obj_values = individual._model.objective_values
+        stop_time = time()
+        self.solve_time = elapsed + stop_time - start_time
+        profile.total_time += stop_time - start_time
+        self.solution = solution
+        return solution
+
+    def _run_generation(self, gen: int, cr: float):
+        profile = self.profile
+        if self.vectorized:
+            obj_pool = self._objective_values
+            self._evolve_generation(cr)
+            with profile.phase("recording"):
+                self._record(obj_pool)
+            return
+
+        # the evaluator follows the accepted trials and is only built again
+        # when the population changed otherwise, e.g. by a restart
+        evaluator = None
+        if cr < INCREMENTAL_CROSSOVER_RATE:
+            evaluator = self._evaluator
+            if evaluator is None or not np.array_equal(evaluator.values, self._positions):
+                evaluator = IncrementalEvaluator(self._model, self._positions)
+                self._evaluator = evaluator
+        obj_pool = list()
+        for index, individual in enumerate(
+            tqdm(self._population, desc="Individual", position=0, leave=False)
+        ):
+            obj_values = self._objective_values[index]
+            with profile.phase("selection"):
                 x_best, x_better, x_worst = self._determine_best_better_worst()
+            with profile.phase("update"):
                 xc = self._evaluate_xc(x_best, x_better, x_worst)
                 individual.calculate_mutant_vector(
                     gen, cr, xc, x_best, x_better, x_worst
                 )
-                individual.update_variables()
-                obj_pool.append(obj_values)
-
-            self.evolution_data.append(obj_pool)
+            with profile.phase("evaluation"):
+                self._objective_values[index] = individual.update_variables(
+                    obj_values[:-1], evaluator, index
+                ) + obj_values[-1:]
+            profile.count_evaluations(1)
+            obj_pool.append(obj_values)
+
+        with profile.phase("recording"):
+            self._record(obj_pool)
+
+        self._evaluate_population()
+
+    def _fitness(self) -> np.ndarray:
+        # the penalties are normalized over the current population, so the
+        # best so far is measured with the total violation, which is not
+        return self._objectives.sum(axis=1) - self._violations.sum(axis=1)
+
+    def _update_best(self):
+        fitness = self._fitness()
+        if not np.any(fitness > self._best[0]):
+            return
+
+        best = int(np.nanargmax(fitness))
+        self._best = (
+            float(fitness[best]),
+            self._positions[best].copy(),
+            -float(self._violations[best].sum()),
+        )
+
+    def _restart_individuals(self, individuals: np.ndarray):
+        """Replace individuals by random ones, penalties being normalized again."""
+        with self.profile.phase("population_creation"):
+            self._positions[individuals] = self._model.get_random_values(len(individuals))
+        with self.profile.phase("evaluation"):
+            objectives, violations = self._model.evaluate_population(
+                self._positions[individuals]
+            )
+        self.profile.count_evaluations(len(individuals))
 
-            self._evatuate_constraint_violation_penalties()
+        all_objectives = self._objectives.copy()
+        all_violations = self._violations.copy()
+        all_objectives[individuals] = objectives
+        all_violations[individuals] = violations
+        self._set_population_values(all_objectives, all_violations)
 
-        best_ind = 0
-        best_obj = sum(self._population[best_ind]._model.objective_values)
-        for j in range(self.num_individuals):
-            obj = self._population[j]._model.objective_values
-            if sum(obj) > best_obj:
-                best_ind = j
-                best_obj = sum(self._population[best_ind]._model.objective_values)
+    def _write_checkpoint(
+        self,
+        writer: CheckpointWriter,
+        generation: int,
+        elapsed: float,
+        tolerance: float,
+        stopping: StoppingRules | None,
+    ):
+        arrays, metadata = recording_state(self.evolution_data, self.recorder, writer)
+        arrays.update(
+            {
+                "positions": self._positions,
+                "objectives": self._objectives,
+                "violations": self._violations,
+                "best_position": self._best[1],
+            }
+        )
+        metadata.update(
+            {
+                "optimizer": "de",
+                "vectorized": self.vectorized,
+                "iteration": generation,
+                "elapsed": elapsed,
+                "tolerance": tolerance,
+                "weights": [self.w1, self.w2, self.w3],
+                "best": [self._best[0], self._best[2]],
+                "stopping": None if stopping is None else stopping.state(),
+                "random": random_states(self._rng),
+            }
+        )
+        writer.write(generation, arrays, metadata)
+
+    def _restore_checkpoint(
+        self, path: str, stopping: StoppingRules | None
+    ) -> tuple[int, float, float]:
+        """
+        Load a checkpoint into the population.
+
+        :return: generation to continue from, time spent before the
+            checkpoint and tolerance
+        :rtype: tuple[int, float, float]
+        """
+        arrays, metadata = load_checkpoint(path)
+        if metadata.get("optimizer") != "de":
+            raise ValueError(f"{path} is not a differential evolution checkpoint.")
+        if metadata["vectorized"] != self.vectorized:
+            raise ValueError(f"{path} was written with vectorized={metadata['vectorized']}.")
+        if arrays["positions"].shape != self._positions.shape:
+            raise ValueError(
+                f"Checkpoint population has shape {arrays['positions'].shape}, "
+                f"expected {self._positions.shape}."
+            )
 
-        stop_time = time()
-        self.solve_time = stop_time - start_time
-        self.solution = self._population[best_ind]._model
-        return self._population[best_ind]._model
+        self._positions[...] = arrays["positions"]
+        self.w1, self.w2, self.w3 = metadata["weights"]
+        # penalties are recomputed from the violations exactly as before
+        self._set_population_values(arrays["objectives"], arrays["violations"])
+        best_fitness, best_penalty = metadata["best"]
+        self._best = (best_fitness, arrays["best_position"], best_penalty)
+        if stopping is not None and metadata["stopping"] is not None:
+            stopping.restore(metadata["stopping"])
+
+        restore_recording(arrays, metadata, self.evolution_data, self.recorder)
+        restore_random_states(metadata["random"], self._rng)
+        return metadata["iteration"], metadata["elapsed"], metadata["tolerance"]
@@ -14,40 +14,53 @@ from time import time
 from pprint import pprint
 
 from solver import Model, ParticleSwarmOptimizer, DifferentialEvolutionOptimizer
+from solver.instances import load_instance
 
 
-def dump_json_results(
+def experiment_results(
     optimizer: ParticleSwarmOptimizer | DifferentialEvolutionOptimizer,
-):
-    solve_time = optimizer.solve_time
+) -> dict:
+    """
+    :return: results of a finished run, as written by :func:`dump_json_results`
+    :rtype: dict
+    """
     solution = optimizer.solution
-    evo_data = optimizer.evolution_data
-    num_vars = solution.num_vars
-    num_constrs = len(solution._constraints)
-    objectives = solution.objective_values
-    solution_variables_values = solution.variables_values
+    if optimizer.recorder is None:
+        evo_data = optimizer.evolution_data
+    else:
+        evo_data = optimizer.recorder.dump()
 
     if isinstance(optimizer, ParticleSwarmOptimizer):
-        extension = "_pso.json"
-        max_iterations = optimizer.max_iterations
         population = optimizer.num_particles
     else:
-        extension = "_de.json"
-        max_iterations = optimizer.max_iterations
         population = optimizer.num_individuals
 
-    file_name = f"{max_iterations}it_{population}_ind{num_vars}var_{num_constrs}cnstr"
-
-    experiment_data = {
-        "solve_time": solve_time,
+    return {
+        "solve_time": optimizer.solve_time,
         "evo_data": evo_data,
-        "num_vars": num_vars,
-        "num_constrs": num_constrs,
-        "objectives": objectives,
-        "solution_variables_values": solution_variables_values,
+        "num_vars": solution.num_vars,
+        "num_constrs": len(solution._constraints),
+        "objectives": solution.objective_values,
+        "solution_variables_values": solution.get_variables_values(),
         "population": population,
-        "max_iterations": max_iterations,
+        "max_iterations": optimizer.max_iterations,
+        "profile": optimizer.profile.summary(),
     }
+
+
+def dump_json_results(
+    optimizer: ParticleSwarmOptimizer | DifferentialEvolutionOptimizer,
+):
+    experiment_data = experiment_results(optimizer)
+    if isinstance(optimizer, ParticleSwarmOptimizer):
+        extension = "_pso.json"
+    else:
+        extension = "_de.json"
+
+    file_name = (
+        f"{experiment_data['max_iterations']}it_{experiment_data['population']}_ind"
+        f"{experiment_data['num_vars']}var_{experiment_data['num_constrs']}cnstr"
+    )
     to_dump = json.dumps(experiment_data)
 
     for i in range(10):
@@ -78,6 +91,12 @@ def assemble_model(TOTAL_NOS=10, T=60) -> tuple[Model, float]:
     ]
     todos_pares_mercadorias = [(i, j, m) for i, j in todos_pares for m in mercadorias]
     fornecedores_mercadorias = [(i, m) for i in nos_fornecedores for m in mercadorias]
+    # destinos saindo de cada nó e origens chegando em cada nó, na ordem de nos
+    saidas = {i: list() for i in nos}
+    entradas = {j: list() for j in nos}
+    for i, j in todos_pares:
+        saidas[i].append(j)
+        entradas[j].append(i)
     ## GERAÇÃO DAS VARIÁVEIS
     p_0_m = model.create_real_variables("p_0_", mercadorias, lb=10, ub=500)
     p_1_m = model.create_real_variables("p_1_", mercadorias, lb=500, ub=1000)
@@ -117,38 +136,38 @@ def assemble_model(TOTAL_NOS=10, T=60) -> tuple[Model, float]:
     r_m = {m: alpha_m[m] * beta_m[m] / gama_m[m] for m in mercadorias}
 
     ## GERAÇÃO DA FUNÇÃO OBJETIVO
+    intermediarios = set(nos_intermediarios)
     objetivo = (
-        sum(
-            sum(
+        model.quicksum(
+            model.quicksum(
                 (
                     (p_1_m[m] - p_0_m[m]) * s_0_i_m[(i, m)]
                     - (p_1_m[m] - p_2_m[m]) * s_1_i_m[(i, m)]
                     - (p_2_m[m] + h_m[m]) * s_2_i_m[(i, m)]
                 )
                 for m in mercadorias
-                if (i, m) in nos_intermediarios
+                if (i, m) in intermediarios
             )
             for i in nos_clientes
         )
-        - sum(
-            sum(
+        - model.quicksum(
+            model.quicksum(
                 (c_i_j_m[(i, j, m)] + v_i[i]) * f_i_j_m[(i, j, m)]
                 for i, j in todos_pares
             )
             for m in mercadorias
         )
-        - sum(u_i[i] * b_i[i] for i in nos)
+        - model.quicksum(u_i[i] * b_i[i] for i in nos)
     )
 
     model.set_objective(objetivo)
     ## GERAÇÃO DAS RESTRIÇÕES DE IGUALDADE
     r_18 = [
-        g_j_m.get((j, m), 0)
-        + s_0_i_m.get((j, m), 0)
-        + sum(f_i_j_m[(i, j, m)] for i in nos if (i, j) in todos_pares)
+        model.quicksum([g_j_m.get((j, m), 0), s_0_i_m.get((j, m), 0)])
+        + model.quicksum(f_i_j_m[(i, j, m)] for i in entradas[j])
         - d_j_m.get((j, m), 0)
         + s_2_i_m.get((j, m), 0)
-        - sum(f_i_j_m[(j, k, m)] for k in nos if (j, k) in todos_pares)
+        - model.quicksum(f_i_j_m[(j, k, m)] for k in saidas[j])
         for j in nos
         for m in mercadorias
     ]
@@ -156,7 +175,8 @@ def assemble_model(TOTAL_NOS=10, T=60) -> tuple[Model, float]:
 
     ## GERAÇÃO DAS RESTRIÇÕES DE MENOR IGUAL
     r_19 = [
-        sum(f_i_j_m[(i, j, m)] for j in nos if (i, j) in todos_pares) - e_i.get(i, 0)
+        model.quicksum(f_i_j_m[(i, j, m)] for j in saidas[i])
+        - e_i.get(i, 0)
         for i in nos
         for m in mercadorias
     ]
@@ -165,7 +185,7 @@ def assemble_model(TOTAL_NOS=10, T=60) -> tuple[Model, float]:
     ]
     r_21 = [
         d_j_m.get((j, m), 0)
-        - sum(f_i_j_m[(i, j, m)] for i in nos if (i, j) in todos_pares)
+        - model.quicksum(f_i_j_m[(i, j, m)] for i in entradas[j])
         for j in nos_clientes
         for m in mercadorias
     ]
@@ -223,62 +243,77 @@ def assemble_model_from_data(
     sink_level_name: str,
     T: int = 60,
     sku_filter: list[str] | None = None,
+    cache_directory: str | None = None,
 ) -> tuple[Model, float]:
+    """
+    Assemble the model of an instance given as tables, parsed once and then
+    loaded from the cache of :func:`load_instance`.
+
+    :param cache_directory: where parsed instances are kept, defaults to
+        ``.cache`` in ``path``; an empty string disables the cache
+    :type cache_directory: str | None
+    """
     print(f"Assembling model")
     model = Model()
 
     ## CARREGAMENTO DOS DADOS BASE
     start_time = time()
 
-    tabela_baseline = pd.read_csv(f"{path}/baseline.csv")
-    tabela_custo_nos = pd.read_csv(f"{path}/custo_nos.csv")
-    tabela_demanda = pd.read_csv(f"{path}/demanda.csv")
-    tabela_frete = pd.read_csv(f"{path}/frete.csv")
-    tabela_nos = pd.read_csv(f"{path}/nos_anonim.csv")
-    tabela_preco = pd.read_csv(f"{path}/valor_mercadoria.csv")
-    tabela_skus = pd.read_csv(f"{path}/skus.csv")
-
-    filtro_mercadoria = tabela_skus["listaDeSkus"] == tabela_skus["listaDeSkus"]
-    if sku_filter:
-        for sku_name in sku_filter:
-            filtro_mercadoria = filtro_mercadoria & (
-                tabela_skus["listaDeSkus"].str.contains(sku_name)
-            )
-
-    mercadorias = tabela_skus["ids"].tolist()
-
-    nos = tabela_nos["idn"].tolist()
-    nos_clientes = tabela_nos[tabela_nos["nivel"] == sink_level_name]["idn"].tolist()
-    nos_fornecedores = tabela_nos[tabela_nos["nivel"] == source_level_name][
-        "idn"
-    ].tolist()
-    nos_intermediarios = list(set(nos) - set(nos_clientes) - set(nos_fornecedores))
-
-    todos_pares = tabela_frete[["origem", "destino"]].drop_duplicates().values.tolist()
-    filtro_mercadoria = tabela_frete["sku"].isin(mercadorias)
-    todos_pares_mercadorias = (
-        tabela_frete[filtro_mercadoria][["origem", "destino", "sku"]]
-        .drop_duplicates()
-        .values.tolist()
+    instancia = load_instance(
+        path, source_level_name, sink_level_name, sku_filter, cache_directory
+    )
+    tabela_custo_nos = instancia.table("custo_nos")
+    tabela_demanda = instancia.table("demanda")
+    tabela_preco = instancia.table("valor_mercadoria")
+
+    mercadorias = instancia["mercadorias"].tolist()
+
+    nos = instancia["nos"].tolist()
+    nos_clientes = instancia["nos_clientes"].tolist()
+    nos_fornecedores = instancia["nos_fornecedores"].tolist()
+    nos_intermediarios = instancia["nos_intermediarios"].tolist()
+
+    fretes = pd.DataFrame(
+        {
+            "origem": instancia["fretes_origem"],
+            "destino": instancia["fretes_destino"],
+            "sku": instancia["fretes_sku"],
+        }
+    )
+    todos_pares_mercadorias = list(
+        zip(
+            instancia["fretes_origem"].tolist(),
+            instancia["fretes_destino"].tolist(),
+            instancia["fretes_sku"].tolist(),
+        )
     )
-    todos_pares_mercadorias = list(map(tuple, todos_pares_mercadorias))
 
-    filtro_mercadoria = tabela_frete["sku"].isin(mercadorias)
-    filtro_fornecedores = tabela_frete["origem"].isin(nos_fornecedores)
-    filtro = filtro_mercadoria & filtro_fornecedores
-    fornecedores_mercadorias = (
-        tabela_frete[filtro][["origem", "sku"]].drop_duplicates().values.tolist()
+    # índices de adjacência por mercadoria: destinos saindo de (origem, sku)
+    # e origens chegando em (destino, sku)
+    saidas = {
+        chave: grupo.tolist()
+        for chave, grupo in fretes.groupby(["origem", "sku"], sort=False)["destino"]
+    }
+    entradas = {
+        chave: grupo.tolist()
+        for chave, grupo in fretes.groupby(["destino", "sku"], sort=False)["origem"]
+    }
+
+    fornecedores_mercadorias = list(
+        zip(
+            instancia["fornecedores_origem"].tolist(),
+            instancia["fornecedores_sku"].tolist(),
+        )
     )
-    fornecedores_mercadorias = list(map(tuple, fornecedores_mercadorias))
 
     ## GERAÇÃO DAS VARIÁVEIS
     print(f"\tCreating variables")
-    preco_max = 10 ** (math.log10(tabela_preco["valorMercadoria"].max()) // 1 + 1)
+    preco_max = 10 ** (math.log10(instancia.scalars["preco_max"]) // 1 + 1)
     p_0_m = model.create_real_variables("p_0_", mercadorias, lb=0, ub=preco_max)
     p_1_m = model.create_real_variables("p_1_", mercadorias, lb=0, ub=preco_max)
     p_2_m = model.create_real_variables("p_2_", mercadorias, lb=0, ub=preco_max)
 
-    demanda_total = 10 ** (math.log10(tabela_demanda["demanda"].sum()) // 1 + 1)
+    demanda_total = 10 ** (math.log10(instancia.scalars["demanda_soma"]) // 1 + 1)
     s_0_i_m = model.create_integer_variables(
         "s_0_", nos_intermediarios, lb=0, ub=demanda_total
     )
@@ -291,7 +326,7 @@ def assemble_model_from_data(
 
     b_i = model.create_binary_variables("b_", nos)
 
-    frete_max = 10 ** (math.log10(tabela_frete["custo"].max()) // 1 + 1)
+    frete_max = 10 ** (math.log10(instancia.scalars["frete_max"]) // 1 + 1)
     c_i_j_m = model.create_real_variables(
         "c_", todos_pares_mercadorias, lb=0, ub=frete_max
     )
@@ -327,40 +362,37 @@ def assemble_model_from_data(
     r_m = {m: alpha_m[m] * beta_m[m] / gama_m[m] for m in mercadorias}
 
     ## GERAÇÃO DA FUNÇÃO OBJETIVO
+    intermediarios = set(nos_intermediarios)
     print("\tSetting objective function")
     objetivo = (
-        sum(
-            sum(
+        model.quicksum(
+            model.quicksum(
                 (
                     (p_1_m.get(m, 0) - p_0_m.get(m, 0)) * s_0_i_m[(i, m)]
                     - (p_1_m.get(m, 0) - p_2_m.get(m, 0)) * s_1_i_m[(i, m)]
                     - (p_2_m.get(m, 0) + h_m.get(m, 0)) * s_2_i_m[(i, m)]
                 )
                 for m in mercadorias
-                if (i, m) in nos_intermediarios
+                if (i, m) in intermediarios
             )
             for i in nos_clientes
         )
-        - sum(
-            sum(
-                (c_i_j_m[(i, j, m)] + v_i[i]) * f_i_j_m[(i, j, m)]
-                for i, j in todos_pares
-            )
-            for m in mercadorias
+        - model.quicksum(
+            (c_i_j_m[(i, j, m)] + v_i[i]) * f_i_j_m[(i, j, m)]
+            for i, j, m in todos_pares_mercadorias
         )
-        - sum(u_i[i] * b_i[i] for i in nos if i in u_i)
+        - model.quicksum(u_i[i] * b_i[i] for i in nos if i in u_i)
     )
 
     model.set_objective(objetivo)
     ## GERAÇÃO DAS RESTRIÇÕES DE IGUALDADE
     print("\tSetting equality constraints")
     r_18 = [
-        g_j_m.get((j, m), 0)
-        + s_0_i_m.get((j, m), 0)
-        + sum(f_i_j_m[(i, j, m)] for i in nos if (i, j) in todos_pares)
+        model.quicksum([g_j_m.get((j, m), 0), s_0_i_m.get((j, m), 0)])
+        + model.quicksum(f_i_j_m[(i, j, m)] for i in entradas.get((j, m), ()))
         - d_j_m.get((j, m), 0)
         + s_2_i_m.get((j, m), 0)
-        - sum(f_i_j_m[(j, k, m)] for k in nos if (j, k) in todos_pares)
+        - model.quicksum(f_i_j_m[(j, k, m)] for k in saidas.get((j, m), ()))
         for j in nos
         for m in mercadorias
     ]
@@ -369,7 +401,8 @@ def assemble_model_from_data(
     ## GERAÇÃO DAS RESTRIÇÕES DE MENOR IGUAL
     print("\tSetting inequality constraints")
     r_19 = [
-        sum(f_i_j_m[(i, j, m)] for j in nos if (i, j) in todos_pares) - e_i.get(i, 0)
+        model.quicksum(f_i_j_m[(i, j, m)] for j in saidas.get((i, m), ()))
+        - e_i.get(i, 0)
         for i in nos
         for m in mercadorias
     ]
@@ -378,7 +411,7 @@ def assemble_model_from_data(
     ]
     r_21 = [
         d_j_m.get((j, m), 0)
-        - sum(f_i_j_m[(i, j, m)] for i in nos if (i, j) in todos_pares)
+        - model.quicksum(f_i_j_m[(i, j, m)] for i in entradas.get((j, m), ()))
         for j in nos_clientes
         for m in mercadorias
     ]
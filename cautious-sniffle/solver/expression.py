@@ -4,6 +4,7 @@ import warnings
 warnings.filterwarnings("ignore")
 
 import operator as op
+import numpy as np
 
 _OPERADORES = {
     "add": "+",
@@ -20,6 +21,92 @@ _OPERADORES = {
 }
 
 
+def _evaluate_operand(operand, values: np.ndarray):
+    evaluate = getattr(operand, "evaluate", None)
+    if evaluate is None:
+        return operand
+    return evaluate(values)
+
+
+def _batched_operation(operator, left, right):
+    """
+    Apply ``operator`` element-wise, mimicking the scalar semantics of
+    ``Expression.value``: divisions by zero give ``inf`` and fractional powers
+    of negative numbers give complex results.
+    """
+    if not isinstance(left, (np.ndarray, np.generic)) and not isinstance(
+        right, (np.ndarray, np.generic)
+    ):
+        try:
+            return operator(left, right)
+        except ZeroDivisionError:
+            return float("inf")
+
+    with np.errstate(all="ignore"):
+        if operator is op.pow:
+            base = np.asarray(left)
+            exponent = np.asarray(right)
+            if np.iscomplexobj(base) or np.any(
+                (base < 0) & (exponent != np.floor(exponent))
+            ):
+                base = base.astype(complex)
+            else:
+                base = base.astype(float)
+            return np.power(base, exponent)
+
+        if operator is op.truediv or operator is op.floordiv:
+            return np.where(np.equal(right, 0), np.inf, operator(left, right))
+
+        return operator(left, right)
+
+
+def _is_constant(value) -> bool:
+    return isinstance(value, (int, float, np.number))
+
+
+# returned by _simplify when the operation has to be built
+_KEPT = object()
+
+
+def _simplify(left, operator, right):
+    """
+    Result of ``left operator right`` known while building expressions:
+    operations between numeric constants are computed, as ``value`` would,
+    and additive and multiplicative identities give the other operand.
+
+    :return: the simplified operand, or ``_KEPT``
+    """
+    left_constant, right_constant = _is_constant(left), _is_constant(right)
+    if left_constant and right_constant:
+        try:
+            return operator(left, right)
+        except ZeroDivisionError:
+            return float("inf")
+        except OverflowError:
+            return _KEPT
+
+    if right_constant:
+        if operator is op.add or operator is op.sub:
+            return left if right == 0 else _KEPT
+        if operator is op.mul or operator is op.truediv or operator is op.pow:
+            return left if right == 1 else _KEPT
+    elif left_constant:
+        if operator is op.add:
+            return right if left == 0 else _KEPT
+        if operator is op.mul:
+            return right if left == 1 else _KEPT
+
+    return _KEPT
+
+
+def _operation(left, operator, right):
+    """Expression ``left operator right``, simplified when possible."""
+    simplified = _simplify(left, operator, right)
+    if simplified is _KEPT:
+        return Expression(left, operator, right)
+    return simplified
+
+
 class Expression:
     def __init__(
         self,
@@ -47,10 +134,41 @@ class Expression:
                 "All or none of lefts, operators and rights must be specified"
             )
 
+        # the lists may be shared with longer expressions built from this
+        # one, only the first _length steps belong to this expression
+        self._length = len(self.a)
+
+    def _extend(self, a, op, b) -> "Expression":
+        """
+        Build ``self`` followed by one more step. The step lists are reused
+        when no other expression has extended them yet, so chaining n
+        operations costs O(n) instead of O(n^2).
+        """
+        if len(self.a) == self._length:
+            lefts, operators, rights = self.a, self.op, self.b
+        else:
+            lefts = self.a[: self._length]
+            operators = self.op[: self._length]
+            rights = self.b[: self._length]
+
+        return Expression(a, op, b, lefts=lefts, operators=operators, rights=rights)
+
+    def _arithmetic(self, operator, other, reflected: bool = False):
+        if reflected:
+            simplified = _simplify(other, operator, self)
+        else:
+            simplified = _simplify(self, operator, other)
+        if simplified is not _KEPT:
+            return simplified
+
+        if reflected:
+            return self._extend(other, operator, None)
+        return self._extend(None, operator, other)
+
     @property
     def value(self) -> Union[float, int]:
         result = 0
-        for position in range(len(self.a)):
+        for position in range(self._length):
             val_a = self.a[position]
             val_b = self.b[position]
             op = self.op[position]
@@ -78,13 +196,40 @@ class Expression:
 
         return result
 
+    def evaluate(self, values: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the expression for many candidates at once.
+
+        :param values: (population x num_vars) matrix of variable values
+        :type values: np.ndarray
+        :return: one value per candidate, or a scalar for constant expressions
+        """
+        result = 0
+        for position in range(self._length):
+            val_a = self.a[position]
+            val_b = self.b[position]
+
+            if val_a is None:
+                left_value = result
+            else:
+                left_value = _evaluate_operand(val_a, values)
+
+            if val_b is None:
+                right_value = result
+            else:
+                right_value = _evaluate_operand(val_b, values)
+
+            result = _batched_operation(self.op[position], left_value, right_value)
+
+        return result
+
     def __repr__(self) -> str:
         # op_name = self.op.__name__
         # op = _OPERADORES.get(op_name, op_name)
         # return f"{self.a} {op} {self.b}"
 
         representation = ""
-        for position in range(len(self.a)):
+        for position in range(self._length):
             val_a = self.a[position]
             val_b = self.b[position]
             op_name = self.op[position].__name__
@@ -109,7 +254,7 @@ class Expression:
         # return f"({self.a} {op} {self.b})"
 
         representation = ""
-        for position in range(len(self.a)):
+        for position in range(self._length):
             val_a = self.a[position]
             val_b = self.b[position]
             op_name = self.op[position].__name__
@@ -129,221 +274,67 @@ class Expression:
         return representation
 
     def __add__(self, other):
-        return Expression(
-            None,
-            op.add,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.add, other)
 
     def __sub__(self, other):
-        return Expression(
-            None,
-            op.sub,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.sub, other)
 
     def __mul__(self, other):
-        return Expression(
-            None,
-            op.mul,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.mul, other)
 
     def __truediv__(self, other):
-        return Expression(
-            None,
-            op.truediv,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.truediv, other)
 
     def __floordiv__(self, other):
-        return Expression(
-            None,
-            op.floordiv,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.floordiv, other)
 
     def __pow__(self, other):
-        return Expression(
-            None,
-            op.pow,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.pow, other)
 
     def __lt__(self, other):
-        return Expression(
-            None,
-            op.lt,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(None, op.lt, other)
 
     def __le__(self, other):
-        return Expression(
-            None,
-            op.le,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(None, op.le, other)
 
     def __eq__(self, other):
-        return Expression(
-            None,
-            op.eq,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(None, op.eq, other)
 
     def __ge__(self, other):
-        return Expression(
-            None,
-            op.ge,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(None, op.ge, other)
 
     def __gt__(self, other):
-        return Expression(
-            None,
-            op.gt,
-            other,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(None, op.gt, other)
 
     def __radd__(self, other):
-        return Expression(
-            other,
-            op.add,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.add, other, reflected=True)
 
     def __rsub__(self, other):
-        return Expression(
-            other,
-            op.sub,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.sub, other, reflected=True)
 
     def __rmul__(self, other):
-        return Expression(
-            other,
-            op.mul,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.mul, other, reflected=True)
 
     def __rtruediv__(self, other):
-        return Expression(
-            other,
-            op.truediv,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.truediv, other, reflected=True)
 
     def __rfloordiv__(self, other):
-        return Expression(
-            other,
-            op.floordiv,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.floordiv, other, reflected=True)
 
     def __rpow__(self, other):
-        return Expression(
-            other,
-            op.pow,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._arithmetic(op.pow, other, reflected=True)
 
     def __rlt__(self, other):
-        return Expression(
-            other,
-            op.lt,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(other, op.lt, None)
 
     def __rle__(self, other):
-        return Expression(
-            other,
-            op.le,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(other, op.le, None)
 
     def __req__(self, other):
-        return Expression(
-            other,
-            op.eq,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(other, op.eq, None)
 
     def __rge__(self, other):
-        return Expression(
-            other,
-            op.ge,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(other, op.ge, None)
 
     def __rgt__(self, other):
-        return Expression(
-            other,
-            op.gt,
-            None,
-            lefts=self.a.copy(),
-            operators=self.op.copy(),
-            rights=self.b.copy(),
-        )
+        return self._extend(other, op.gt, None)
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import numpy as np
+import operator as op
+
+from .expression import Expression, _batched_operation, _evaluate_operand
+from .sums import LinearSum, Sum
+from .variables import _Variable
+
+# operators whose operands may be swapped without changing the result
+_COMMUTATIVE = (op.add, op.mul)
+
+
+class ExpressionGraph:
+    """
+    Hash-consed DAG of the expressions of a model.
+
+    Expressions are lowered into nodes identified by their operator and
+    children, so identical subexpressions, even when built as distinct
+    objects, become a single node. Evaluation computes every distinct node
+    once per call and drops intermediate results as soon as their last
+    consumer is done.
+
+    Nodes are numbered in topological order, children before parents, and
+    described by tuples:
+
+    - ``("const", type, value)``
+    - ``("var", index)``
+    - ``("linear", indexes, coefficients, constant)``
+    - ``("sum", children)``
+    - ``("opaque", position)``, any other object having ``evaluate``
+    - ``(operator, left, right)``
+    """
+
+    def __init__(self) -> None:
+        self._nodes: list[tuple] = list()
+        self._ids: dict[tuple, int] = dict()
+        self._lowered: dict[int, tuple[object, int]] = dict()
+        self._linear_arrays: dict[int, tuple[np.ndarray, np.ndarray]] = dict()
+        self._opaque: list = list()
+        self._schedules: dict[tuple[int, ...], list[tuple[int, list[int]]]] = dict()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, expression) -> int:
+        """
+        Lower ``expression`` into the graph.
+
+        :param expression: constant, variable or expression
+        :return: id of the node computing the expression
+        :rtype: int
+        """
+        lowered = self._lowered.get(id(expression))
+        if lowered is not None:
+            return lowered[1]
+
+        if isinstance(expression, _Variable):
+            node = self._intern(("var", expression.index))
+
+        elif isinstance(expression, LinearSum):
+            node = self._add_linear_sum(expression)
+
+        elif isinstance(expression, Sum):
+            children = tuple(
+                self.add(expression.terms[k]) for k in range(expression._length)
+            )
+            node = self._intern(("sum", children))
+
+        elif isinstance(expression, Expression):
+            node = self._intern(("const", int, 0))
+            for position in range(expression._length):
+                val_a = expression.a[position]
+                val_b = expression.b[position]
+                left = node if val_a is None else self.add(val_a)
+                right = node if val_b is None else self.add(val_b)
+                node = self._add_operation(expression.op[position], left, right)
+
+        elif getattr(expression, "evaluate", None) is not None:
+            self._opaque.append(expression)
+            node = self._intern(("opaque", len(self._opaque) - 1))
+
+        else:
+            return self._intern(("const", type(expression), expression))
+
+        # the expression is kept alive so that its id is not reused
+        self._lowered[id(expression)] = (expression, node)
+        return node
+
+    def _add_linear_sum(self, expression: LinearSum) -> int:
+        weights = dict()
+        for k in range(expression._length):
+            index = expression.variables[k].index
+            weights[index] = weights.get(index, 0.0) + expression.coefficients[k]
+
+        indexes = tuple(sorted(weights))
+        key = (
+            "linear",
+            indexes,
+            tuple(weights[index] for index in indexes),
+            expression.constant,
+        )
+        node = self._intern(key)
+        if node not in self._linear_arrays:
+            self._linear_arrays[node] = (
+                np.array(indexes, dtype=int),
+                np.array(key[2], dtype=float),
+            )
+        return node
+
+    def _add_operation(self, operator, left: int, right: int) -> int:
+        if operator in _COMMUTATIVE and right < left:
+            left, right = right, left
+        return self._intern((operator, left, right))
+
+    def _intern(self, key: tuple) -> int:
+        node = self._ids.get(key)
+        if node is None:
+            node = len(self._nodes)
+            self._nodes.append(key)
+            self._ids[key] = node
+        return node
+
+    def _children(self, node: int) -> tuple[int, ...]:
+        key = self._nodes[node]
+        if key[0] == "sum":
+            return key[1]
+        if isinstance(key[0], str):
+            return ()
+        return key[1], key[2]
+
+    def node_variables(self) -> list[frozenset[int] | None]:
+        """
+        Indexes of the variables every node depends on, ``None`` for nodes
+        that may depend on any variable.
+        """
+        dependencies: list[frozenset[int] | None] = list()
+        for node, key in enumerate(self._nodes):
+            kind = key[0]
+            if kind == "var":
+                variables = frozenset((key[1],))
+            elif kind == "linear":
+                variables = frozenset(key[1])
+            elif kind == "opaque":
+                variables = None
+            else:
+                variables = frozenset()
+                for child in self._children(node):
+                    if dependencies[child] is None:
+                        variables = None
+                        break
+                    variables = variables | dependencies[child]
+            dependencies.append(variables)
+
+        return dependencies
+
+    def terms(self, node: int) -> list[tuple[int, float]]:
+        """
+        Split ``node`` into the terms it adds together, looking through sums,
+        additions, subtractions and products by constants.
+
+        :param node: id of the node to split
+        :type node: int
+        :return: (term node, weight) pairs, the node equals the weighted sum
+            of its terms
+        :rtype: list[tuple[int, float]]
+        """
+        terms = list()
+        stack = [(node, 1.0)]
+        while stack:
+            node, weight = stack.pop()
+            key = self._nodes[node]
+            kind = key[0]
+
+            if kind == "sum":
+                stack.extend((child, weight) for child in reversed(key[1]))
+            elif kind is op.add:
+                stack.extend([(key[2], weight), (key[1], weight)])
+            elif kind is op.sub:
+                stack.extend([(key[2], -weight), (key[1], weight)])
+            elif kind is op.mul and self._is_real_constant(key[1]):
+                stack.append((key[2], weight * self._nodes[key[1]][2]))
+            elif kind is op.mul and self._is_real_constant(key[2]):
+                stack.append((key[1], weight * self._nodes[key[2]][2]))
+            else:
+                terms.append((node, weight))
+
+        return terms
+
+    def _is_real_constant(self, node: int) -> bool:
+        key = self._nodes[node]
+        return key[0] == "const" and key[1] in (int, float)
+
+    def _schedule(
+        self, outputs: tuple[int, ...], cache: bool = True
+    ) -> list[tuple[int, list[int]]]:
+        """
+        Nodes needed by ``outputs`` in evaluation order, each with the nodes
+        whose results may be dropped once it is computed.
+        """
+        schedule = self._schedules.get(outputs)
+        if schedule is not None:
+            return schedule
+
+        needed = set()
+        stack = list(outputs)
+        while stack:
+            node = stack.pop()
+            if node not in needed:
+                needed.add(node)
+                stack.extend(self._children(node))
+
+        order = sorted(needed)
+        last_use = dict()
+        for node in order:
+            for child in self._children(node):
+                last_use[child] = node
+
+        kept = set(outputs)
+        releases = {node: list() for node in order}
+        for child, node in last_use.items():
+            if child not in kept:
+                releases[node].append(child)
+
+        schedule = [(node, releases[node]) for node in order]
+        if cache:
+            self._schedules[outputs] = schedule
+        return schedule
+
+    def evaluate(
+        self, values: np.ndarray, outputs: list[int], cache: bool = True
+    ) -> list:
+        """
+        Evaluate the nodes ``outputs`` for many candidates at once.
+
+        :param values: (population x num_vars) matrix of variable values
+        :type values: np.ndarray
+        :param outputs: ids of the nodes to compute
+        :type outputs: list[int]
+        :param cache: keep the evaluation order of ``outputs`` for later
+            calls, disable for one-off sets of outputs
+        :type cache: bool
+        :return: one value per candidate of every output node, or a scalar
+            for constant nodes
+        :rtype: list
+        """
+        results = dict()
+        for node, releases in self._schedule(tuple(outputs), cache):
+            key = self._nodes[node]
+            kind = key[0]
+
+            if kind == "const":
+                value = key[2]
+            elif kind == "var":
+                value = values[..., key[1]]
+            elif kind == "linear":
+                indexes, weights = self._linear_arrays[node]
+                value = values[..., indexes] @ weights + key[3]
+            elif kind == "sum":
+                value = 0
+                for child in key[1]:
+                    value = _batched_operation(op.add, value, results[child])
+            elif kind == "opaque":
+                value = _evaluate_operand(self._opaque[key[1]], values)
+            else:
+                value = _batched_operation(kind, results[key[1]], results[key[2]])
+
+            results[node] = value
+            for child in releases:
+                del results[child]
+
+        return [results[node] for node in outputs]
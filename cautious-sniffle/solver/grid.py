@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import os
+import random as rd
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from multiprocessing import cpu_count
+
+import numpy as np
+
+from .de import DifferentialEvolutionOptimizer
+from .experiments import assemble_model, assemble_model_from_data, experiment_results
+from .model import Model
+from .pso import ParticleSwarmOptimizer
+from .serialization import FORMAT_VERSION, load_model, save_model
+
+# keys of a grid spec swept when given as lists
+SWEPT_KEYS = ("optimizer", "scenario", "T", "iterations", "population")
+
+# optimizer options that do not change the results of a run
+_EXECUTION_OPTIONS = ("workers",)
+
+# models built by this process, by model fingerprint
+_models: dict[str, Model] = dict()
+
+
+def expand_grid(spec: dict) -> list[dict]:
+    """
+    Runs of a grid spec such as::
+
+        {
+            "optimizer": ["pso", "de"],
+            "scenario": [5, 6, 7],
+            "T": 60,
+            "iterations": [100, 1000],
+            "population": [100],
+            "repetitions": 10,
+            "options": {"pso": {"workers": 1}, "de": {"vectorized": True}},
+        }
+
+    Swept keys given as lists are combined, other values are shared by every
+    run. Options are keyword arguments of the optimizers, either shared or
+    given per optimizer. A scenario is either the number of nodes given to ``assemble_model``
+    or the keyword arguments of ``assemble_model_from_data`` but ``T``.
+    Repetition ``r`` runs with seed ``seed + r``; every repetition solves the
+    same instance, generated with ``model_seed``.
+
+    :param spec: grid specification
+    :type spec: dict
+    :return: one dictionary per run
+    :rtype: list[dict]
+    """
+    swept = [
+        spec[key] if isinstance(spec[key], list) else [spec[key]] for key in SWEPT_KEYS
+    ]
+    base_seed = spec.get("seed", 0)
+
+    runs = list()
+    for values in itertools.product(*swept):
+        for repetition in range(spec.get("repetitions", 1)):
+            run = dict(zip(SWEPT_KEYS, values))
+            run["model_seed"] = spec.get("model_seed", 0)
+            run["seed"] = base_seed + repetition
+            options = spec.get("options", dict())
+            run["options"] = dict(options.get(run["optimizer"], options))
+            runs.append(run)
+
+    return runs
+
+
+def _hash(data) -> str:
+    text = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _files_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if os.path.isfile(file_path):
+            digest.update(name.encode())
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _source_digest() -> str:
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            digest.update(name.encode())
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def model_fingerprint(run: dict) -> dict:
+    """
+    Description of the instance solved by a run; data scenarios are
+    described by the contents of their files rather than by their path.
+    It includes a digest of the solver sources and the model file format,
+    so that results and models cached by other code are never reused.
+    """
+    scenario = run["scenario"]
+    if isinstance(scenario, dict):
+        scenario = dict(scenario)
+        scenario["data"] = _files_digest(scenario.pop("path"))
+    return {
+        "scenario": scenario,
+        "T": run["T"],
+        "model_seed": run["model_seed"],
+        "code": _source_digest(),
+        "format": FORMAT_VERSION,
+    }
+
+
+def run_key(run: dict) -> str:
+    """
+    :return: hash of the instance, optimizer parameters and seed of a run
+    :rtype: str
+    """
+    options = {
+        name: value
+        for name, value in run["options"].items()
+        if name not in _EXECUTION_OPTIONS
+    }
+    return _hash(
+        {
+            "model": model_fingerprint(run),
+            "optimizer": run["optimizer"],
+            "iterations": run["iterations"],
+            "population": run["population"],
+            "options": options,
+            "seed": run["seed"],
+        }
+    )
+
+
+class ResultCache:
+    """
+    Results of runs stored as JSON files named by their key, under
+    ``directory/<first two characters>/<key>.json``.
+
+    :param directory: root of the cache
+    :type directory: str
+    """
+
+    def __init__(self, directory: str = "results/cache") -> None:
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def load(self, key: str) -> dict:
+        with open(self.path(key)) as f:
+            return json.load(f)
+
+    def model_path(self, fingerprint: str) -> str:
+        return os.path.join(self.directory, "models", f"{fingerprint}.npz")
+
+    def store(self, key: str, results: dict):
+        # written aside and renamed, an interrupted write is never a result
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(results, f)
+        os.replace(temporary, path)
+
+
+def _model(run: dict, path: str | None = None) -> Model:
+    fingerprint = _hash(model_fingerprint(run))
+    if fingerprint not in _models:
+        if path is not None and os.path.isfile(path):
+            _models[fingerprint] = load_model(path)
+            return _models[fingerprint]
+
+        rd.seed(run["model_seed"])
+        np.random.seed(run["model_seed"])
+        scenario = run["scenario"]
+        if isinstance(scenario, dict):
+            model, _ = assemble_model_from_data(T=run["T"], **scenario)
+        else:
+            model, _ = assemble_model(scenario, run["T"])
+        _models[fingerprint] = model
+
+    return _models[fingerprint]
+
+
+def _model_path(run: dict, cache: ResultCache) -> str:
+    """
+    File of the model of a run, assembled and saved on first use, so that
+    workers load it instead of assembling it again.
+    """
+    path = cache.model_path(_hash(model_fingerprint(run)))
+    if not os.path.isfile(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_model(_model(run), path)
+    return path
+
+
+def execute_run(run: dict, model_path: str | None = None) -> dict:
+    """
+    Solve the instance of a run.
+
+    :param model_path: file of the model, see :func:`save_model`, assembled
+        when not given
+    :type model_path: str | None
+    :return: results of :func:`experiment_results`, with the run itself
+    :rtype: dict
+    """
+    model = _model(run, model_path)
+    seed = run["seed"]
+    rd.seed(seed)
+    np.random.seed(seed)
+
+    if run["optimizer"] == "pso":
+        optimizer = ParticleSwarmOptimizer(
+            model,
+            num_particles=run["population"],
+            max_iterations=run["iterations"],
+            **run["options"],
+        )
+    elif run["optimizer"] == "de":
+        options = {
+            name: value for name, value in run["options"].items() if name != "workers"
+        }
+        optimizer = DifferentialEvolutionOptimizer(
+            model,
+            num_individuals=run["population"],
+            max_iterations=run["iterations"],
+            seed=seed,
+            **options,
+        )
+    else:
+        raise ValueError(f"Unknown optimizer {run['optimizer']}.")
+
+    optimizer.optimize()
+    results = experiment_results(optimizer)
+    results["run"] = run
+    return results
+
+
+def run_grid(
+    spec: dict, cache: ResultCache | None = None, jobs: int | None = None
+) -> list[str]:
+    """
+    Run every run of a grid missing from the cache, in parallel.
+
+    PSO runs use ``options["workers"]`` processes each, one when not given,
+    and the pool is sized so that all runs together use the available
+    cores. Runs sharing a key are computed once. Every model is assembled
+    once and saved in the cache, from where the workers load it.
+
+    :param spec: grid specification, see :func:`expand_grid`
+    :type spec: dict
+    :param cache: where results are looked up and stored
+    :type cache: ResultCache | None
+    :param jobs: concurrent runs, defaults to cores over workers per run
+    :type jobs: int | None
+    :return: keys of the runs, in the order of :func:`expand_grid`
+    :rtype: list[str]
+    :raises RuntimeError: when runs failed, once the others are cached
+    """
+    cache = ResultCache() if cache is None else cache
+    runs = expand_grid(spec)
+    for run in runs:
+        if run["optimizer"] == "pso":
+            run["options"].setdefault("workers", 1)
+
+    keys = [run_key(run) for run in runs]
+    missing = {key: run for key, run in zip(keys, runs) if key not in cache}
+    print(f"{len(runs) - len(missing)} of {len(runs)} runs cached, {len(missing)} to run")
+
+    if jobs is None:
+        workers = max(run["options"].get("workers", 1) for run in runs) if runs else 1
+        jobs = max(1, cpu_count() // workers)
+    jobs = min(jobs, len(missing))
+
+    model_paths = {key: _model_path(run, cache) for key, run in missing.items()}
+
+    # a failed run does not discard the others, which are cached first
+    failures = list()
+    if jobs <= 1:
+        for key, run in missing.items():
+            try:
+                cache.store(key, execute_run(run, model_paths[key]))
+            except Exception as error:
+                failures.append((run, error))
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            futures = {
+                executor.submit(execute_run, run, model_paths[key]): key
+                for key, run in missing.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    cache.store(futures[future], future.result())
+                except Exception as error:
+                    failures.append((missing[futures[future]], error))
+
+    if failures:
+        run, error = failures[0]
+        raise RuntimeError(f"{len(failures)} runs failed, first {run}: {error!r}")
+
+    return keys
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from scipy import sparse
+
+from .graph import ExpressionGraph
+
+if TYPE_CHECKING:
+    from .model import Model
+
+
+class DependencyIndex:
+    """
+    Reverse index from every variable to the affine constraint rows, the
+    nonlinear constraints and the objective terms depending on it.
+
+    Objectives are split in weighted terms, see
+    :meth:`ExpressionGraph.terms`, so that a change only recomputes the terms
+    it touches. Every term belongs either to an objective or to a nonlinear
+    constraint.
+
+    :param graph: expression graph of the model
+    :type graph: ExpressionGraph
+    :param objective_nodes: graph node of every objective
+    :type objective_nodes: list[int]
+    :param constraint_nodes: graph node of every nonlinear constraint
+    :type constraint_nodes: list[int]
+    :param linear_matrix: matrix ``A`` of the affine constraints
+    :type linear_matrix: sparse.csr_matrix
+    :param num_vars: number of model variables
+    :type num_vars: int
+    """
+
+    def __init__(
+        self,
+        graph: ExpressionGraph,
+        objective_nodes: list[int],
+        constraint_nodes: list[int],
+        linear_matrix: sparse.csr_matrix,
+        num_vars: int,
+    ) -> None:
+        self.graph = graph
+        self.linear_columns = sparse.csc_matrix(linear_matrix)
+
+        term_nodes, term_weights = list(), list()
+        term_objectives, term_constraints = list(), list()
+        for column, node in enumerate(objective_nodes):
+            for term, weight in graph.terms(node):
+                term_nodes.append(term)
+                term_weights.append(weight)
+                term_objectives.append(column)
+                term_constraints.append(-1)
+        for position, node in enumerate(constraint_nodes):
+            term_nodes.append(node)
+            term_weights.append(1.0)
+            term_objectives.append(-1)
+            term_constraints.append(position)
+
+        self.term_nodes = np.array(term_nodes, dtype=int)
+        self.term_weights = np.array(term_weights, dtype=float)
+        self.term_objectives = np.array(term_objectives, dtype=int)
+        self.term_constraints = np.array(term_constraints, dtype=int)
+
+        node_variables = graph.node_variables()
+        variable_terms: list[list[int]] = [list() for _ in range(num_vars)]
+        for term, node in enumerate(term_nodes):
+            variables = node_variables[node]
+            if variables is None:
+                variables = range(num_vars)
+            for index in variables:
+                variable_terms[index].append(term)
+
+        self.variable_terms = [np.array(terms, dtype=int) for terms in variable_terms]
+
+    @property
+    def num_terms(self) -> int:
+        return len(self.term_nodes)
+
+    def affected_terms(self, variables: np.ndarray) -> np.ndarray:
+        """
+        Terms depending on any of ``variables``.
+
+        :param variables: variable indexes
+        :type variables: np.ndarray
+        :return: sorted term positions
+        :rtype: np.ndarray
+        """
+        if len(variables) == 0:
+            return np.empty(0, dtype=int)
+        return np.unique(
+            np.concatenate([self.variable_terms[index] for index in variables])
+        )
+
+
+class IncrementalEvaluator:
+    """
+    Objective values and constraint violations of a population, updated
+    when candidates change instead of being recomputed from scratch.
+
+    The activities ``A x`` of the affine rows are updated with the columns
+    of the changed variables, and only the nonlinear constraints and
+    objective terms depending on them are evaluated again; objective sums
+    are updated by the difference of their terms. Changes of more than
+    ``full_fraction`` of the variables, or touching more than that fraction
+    of the terms, fall back to a full evaluation of the candidate, as does
+    :meth:`refresh`.
+
+    :param model: Model being solved
+    :type model: Model
+    :param values: (population x num_vars) matrix of candidates
+    :type values: np.ndarray
+    :param full_fraction: fraction of the terms above which a candidate is
+        evaluated from scratch
+    :type full_fraction: float
+    """
+
+    def __init__(self, model: Model, values: np.ndarray, full_fraction: float = 0.5) -> None:
+        self._model = model
+        self._index = model.dependency_index
+        self._matrix, self._rhs = model.linear_constraints
+        self._linear_rows = np.array(model._linear_rows, dtype=int)
+        self._nonlinear_rows = np.array(model._nonlinear_rows, dtype=int)
+        self.full_fraction = full_fraction
+
+        self.values = np.atleast_2d(np.array(values, dtype=float))
+        population = self.values.shape[0]
+        self.objectives = np.empty((population, len(model._objectives)))
+        self.violations = np.empty((population, len(model._constraints)))
+        self._activities = np.empty((population, len(self._linear_rows)))
+        self._term_values = np.zeros((population, self._index.num_terms), dtype=complex)
+        # last change computed by peek, reused when update makes it
+        self._peeked: tuple[int, np.ndarray, tuple | None] | None = None
+
+        self.refresh()
+
+    def refresh(self, rows: np.ndarray | slice = slice(None)):
+        """
+        Evaluate candidates ``rows`` from scratch, discarding any rounding
+        accumulated by incremental updates.
+        """
+        self._peeked = None
+        values = self.values[rows]
+        index = self._index
+        population = values.shape[0]
+
+        terms = index.graph.evaluate(values, index.term_nodes.tolist())
+        term_values = np.zeros((population, index.num_terms), dtype=complex)
+        for position, value in enumerate(terms):
+            term_values[:, position] = np.broadcast_to(value, (population,))
+
+        objectives = np.zeros((population, self.objectives.shape[1]))
+        objective_terms = index.term_objectives >= 0
+        for position in np.flatnonzero(objective_terms):
+            column = index.term_objectives[position]
+            objectives[:, column] += (
+                index.term_weights[position] * term_values[:, position].real
+            )
+
+        constraint_terms = np.flatnonzero(index.term_constraints >= 0)
+        self._term_values[rows] = term_values
+        self.objectives[rows] = objectives
+        self._activities[rows] = (self._matrix @ values.T).T
+
+        violations = self.violations[rows]
+        violations[:, self._linear_rows] = self._model._constraint_violations(
+            self._activities[rows] - self._rhs, self._linear_rows
+        )
+        constraint_rows = self._nonlinear_rows[index.term_constraints[constraint_terms]]
+        violations[:, constraint_rows] = self._model._constraint_violations(
+            term_values[:, constraint_terms], constraint_rows
+        )
+        self.violations[rows] = violations
+
+    def peek(self, row: int, position: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Objective values and constraint violations of candidate ``row`` moved
+        to ``position``, leaving the population unchanged.
+
+        :param row: candidate being changed
+        :type row: int
+        :param position: new variable values of the candidate
+        :type position: np.ndarray
+        :return: objective values and constraint violations
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        change = self._change(row, position)
+        self._peeked = (row, np.array(position, dtype=float), change)
+        if change is None:
+            objectives, violations = self._model.evaluate_population(position)
+            return objectives[0], violations[0]
+
+        objectives, violations = change[:2]
+        return objectives, violations
+
+    def update(self, row: int, position: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Move candidate ``row`` to ``position``, updating only what depends on
+        the changed variables.
+
+        :param row: candidate being changed
+        :type row: int
+        :param position: new variable values of the candidate
+        :type position: np.ndarray
+        :return: objective values and constraint violations of the candidate
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        peeked, self._peeked = self._peeked, None
+        if peeked is not None and peeked[0] == row and np.array_equal(peeked[1], position):
+            change = peeked[2]
+        else:
+            change = self._change(row, position)
+        self.values[row] = position
+        if change is None:
+            self.refresh(slice(row, row + 1))
+        else:
+            objectives, violations, activities, terms, term_values = change
+            self.objectives[row] = objectives
+            self.violations[row] = violations
+            self._activities[row] = activities
+            self._term_values[row, terms] = term_values
+
+        return self.objectives[row].copy(), self.violations[row].copy()
+
+    def _change(self, row: int, position: np.ndarray) -> tuple | None:
+        index = self._index
+        current = self.values[row]
+        changed = np.flatnonzero(position != current)
+        if len(changed) > self.full_fraction * max(1, len(current)):
+            return None
+
+        terms = index.affected_terms(changed)
+        if len(terms) > self.full_fraction * max(1, index.num_terms):
+            return None
+
+        objectives = self.objectives[row].copy()
+        violations = self.violations[row].copy()
+        activities = self._activities[row].copy()
+
+        if len(self._linear_rows) and len(changed):
+            columns = index.linear_columns[:, changed]
+            delta = columns @ (position[changed] - current[changed])
+            touched = np.unique(columns.indices)
+            activities[touched] += delta[touched]
+            violations[self._linear_rows[touched]] = self._model._constraint_violations(
+                activities[touched] - self._rhs[touched], self._linear_rows[touched]
+            )
+
+        term_values = np.empty(len(terms), dtype=complex)
+        if len(terms):
+            values = np.array(position, dtype=float)[np.newaxis, :]
+            results = index.graph.evaluate(
+                values, index.term_nodes[terms].tolist(), cache=False
+            )
+            for k, value in enumerate(results):
+                term_values[k] = np.broadcast_to(value, (1,))[0]
+
+            objective_terms = index.term_objectives[terms] >= 0
+            np.add.at(
+                objectives,
+                index.term_objectives[terms][objective_terms],
+                (
+                    index.term_weights[terms]
+                    * (term_values - self._term_values[row, terms]).real
+                )[objective_terms],
+            )
+
+            constraint_terms = ~objective_terms
+            constraint_rows = self._nonlinear_rows[index.term_constraints[terms][constraint_terms]]
+            violations[constraint_rows] = self._model._constraint_violations(
+                term_values[constraint_terms], constraint_rows
+            )
+
+        return objectives, violations, activities, terms, term_values
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# bumped whenever the cached contents change
+CACHE_VERSION = 2
+
+# tables read by assemble_model_from_data
+SOURCE_FILES = (
+    "custo_nos.csv",
+    "demanda.csv",
+    "frete.csv",
+    "nos_anonim.csv",
+    "valor_mercadoria.csv",
+    "skus.csv",
+)
+
+# tables kept whole, with the columns used for the model constants
+TABLES = {
+    "custo_nos": (
+        "no",
+        "capFornecimento",
+        "capExpedicao",
+        "custoVariavelExpedicao",
+        "custoFixo",
+    ),
+    "demanda": ("no", "sku", "demanda"),
+    "valor_mercadoria": ("sku", "valorMercadoria"),
+}
+
+
+def instance_key(
+    path: str,
+    source_level_name: str,
+    sink_level_name: str,
+    sku_filter: list[str] | None = None,
+) -> str:
+    """
+    :return: hash of the size and modification time of the source files and
+        of the parsing arguments
+    :rtype: str
+    """
+    files = list()
+    for name in SOURCE_FILES:
+        status = os.stat(os.path.join(path, name))
+        files.append([name, status.st_size, status.st_mtime_ns])
+
+    description = {
+        "version": CACHE_VERSION,
+        "files": files,
+        "levels": [source_level_name, sink_level_name],
+        "sku_filter": list(sku_filter or []),
+    }
+    text = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def parse_instance(
+    path: str,
+    source_level_name: str,
+    sink_level_name: str,
+    sku_filter: list[str] | None = None,
+) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Read the tables of an instance and derive its index lists.
+
+    :param sku_filter: keep only the SKUs whose ``listaDeSkus`` contains
+        every one of these names
+    :type sku_filter: list[str] | None
+    :return: typed arrays of nodes, arcs, SKUs and constants tables, and
+        the scalar bounds
+    :rtype: tuple[dict[str, np.ndarray], dict]
+    """
+    tabela_custo_nos = pd.read_csv(f"{path}/custo_nos.csv")
+    tabela_demanda = pd.read_csv(f"{path}/demanda.csv")
+    tabela_frete = pd.read_csv(f"{path}/frete.csv")
+    tabela_nos = pd.read_csv(f"{path}/nos_anonim.csv")
+    tabela_preco = pd.read_csv(f"{path}/valor_mercadoria.csv")
+    tabela_skus = pd.read_csv(f"{path}/skus.csv")
+
+    filtro_skus = pd.Series(True, index=tabela_skus.index)
+    for sku_name in sku_filter or []:
+        filtro_skus &= tabela_skus["listaDeSkus"].str.contains(sku_name, na=False)
+
+    mercadorias = tabela_skus[filtro_skus]["ids"]
+    nos = tabela_nos["idn"]
+    nos_clientes = tabela_nos[tabela_nos["nivel"] == sink_level_name]["idn"]
+    nos_fornecedores = tabela_nos[tabela_nos["nivel"] == source_level_name]["idn"]
+    nos_intermediarios = list(
+        set(nos.tolist()) - set(nos_clientes.tolist()) - set(nos_fornecedores.tolist())
+    )
+
+    filtro_mercadoria = tabela_frete["sku"].isin(mercadorias)
+    fretes = tabela_frete[filtro_mercadoria][["origem", "destino", "sku"]].drop_duplicates()
+    filtro = filtro_mercadoria & tabela_frete["origem"].isin(nos_fornecedores)
+    fornecedores_mercadorias = tabela_frete[filtro][["origem", "sku"]].drop_duplicates()
+
+    arrays = {
+        "mercadorias": mercadorias.to_numpy(),
+        "nos": nos.to_numpy(),
+        "nos_clientes": nos_clientes.to_numpy(),
+        "nos_fornecedores": nos_fornecedores.to_numpy(),
+        "nos_intermediarios": np.array(nos_intermediarios, dtype=nos.dtype),
+        "fretes_origem": fretes["origem"].to_numpy(),
+        "fretes_destino": fretes["destino"].to_numpy(),
+        "fretes_sku": fretes["sku"].to_numpy(),
+        "fornecedores_origem": fornecedores_mercadorias["origem"].to_numpy(),
+        "fornecedores_sku": fornecedores_mercadorias["sku"].to_numpy(),
+    }
+    tables = {
+        "custo_nos": tabela_custo_nos,
+        "demanda": tabela_demanda,
+        "valor_mercadoria": tabela_preco,
+    }
+    for table, columns in TABLES.items():
+        for column in columns:
+            arrays[f"{table}.{column}"] = tables[table][column].to_numpy()
+
+    scalars = {
+        "preco_max": float(tabela_preco["valorMercadoria"].max()),
+        "demanda_soma": float(tabela_demanda["demanda"].sum()),
+        "frete_max": float(tabela_frete["custo"].max()),
+    }
+    return arrays, scalars
+
+
+class Instance:
+    """
+    Parsed tables of an ``assemble_model_from_data`` instance.
+
+    :param arrays: typed arrays, ``table.column`` for the constants tables
+    :type arrays: dict[str, np.ndarray]
+    :param scalars: bounds derived from the tables
+    :type scalars: dict
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray], scalars: dict) -> None:
+        self.arrays = arrays
+        self.scalars = scalars
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def table(self, name: str) -> pd.DataFrame:
+        return pd.DataFrame(
+            {column: self.arrays[f"{name}.{column}"] for column in TABLES[name]}
+        )
+
+    def save(self, directory: str):
+        """
+        Write every array to its own ``.npy`` file, so that they can be
+        loaded memory-mapped. The directory is replaced atomically.
+        """
+        temporary = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+
+        names = list()
+        for k, (name, array) in enumerate(self.arrays.items()):
+            if array.dtype == object:
+                array = array.astype(str)
+            np.save(os.path.join(temporary, f"{k}.npy"), array, allow_pickle=False)
+            names.append(name)
+        with open(os.path.join(temporary, "meta.json"), "w") as f:
+            json.dump({"arrays": names, "scalars": self.scalars}, f)
+
+        try:
+            os.replace(temporary, directory)
+        except OSError:
+            # written meanwhile by another process, whose copy is the same
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str) -> Instance:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{k}.npy"), mmap_mode="r")
+            for k, name in enumerate(meta["arrays"])
+        }
+        return cls(arrays, meta["scalars"])
+
+
+def load_instance(
+    path: str,
+    source_level_name: str,
+    sink_level_name: str,
+    sku_filter: list[str] | None = None,
+    cache_directory: str | None = None,
+) -> Instance:
+    """
+    Parse an instance, or load it memory-mapped from the cache when its
+    source files are unchanged since it was parsed.
+
+    :param path: directory of the instance tables
+    :type path: str
+    :param cache_directory: where parsed instances are kept, defaults to
+        ``.cache`` in ``path``; an empty string disables the cache
+    :type cache_directory: str | None
+    :rtype: Instance
+    """
+    if cache_directory == "":
+        return Instance(*parse_instance(path, source_level_name, sink_level_name, sku_filter))
+
+    if cache_directory is None:
+        cache_directory = os.path.join(path, ".cache")
+    key = instance_key(path, source_level_name, sink_level_name, sku_filter)
+    directory = os.path.join(cache_directory, key)
+
+    if not os.path.isfile(os.path.join(directory, "meta.json")):
+        os.makedirs(cache_directory, exist_ok=True)
+        instance = Instance(
+            *parse_instance(path, source_level_name, sink_level_name, sku_filter)
+        )
+        instance.save(directory)
+
+    return Instance.load(directory)
@@ -2,27 +2,83 @@ from re import L
 from typing import Iterable
 import numpy as np
 
+from scipy import sparse
+
 from copy import deepcopy
 from .expression import Expression
-from .variables import RealVariable, BinVariable, IntVariable
+from .compiler import CompiledGraph
+from .graph import ExpressionGraph
+from .incremental import DependencyIndex, IncrementalEvaluator
+from .sums import quicksum, affine_form
+from .variables import RealVariable, BinVariable, IntVariable, VarType
 
 class Model:
     def __init__(self) -> None:
         self._objectives: list = list()
         self._constraints: list = list()
 
-        self._variables: dict[str, RealVariable | BinVariable | IntVariable] = dict()
-        self._variables_values: dict[RealVariable | BinVariable | IntVariable, float] = dict()
-        self._variables_lower_bounds: dict[RealVariable | BinVariable | IntVariable, float | None] = dict()
-        self._variables_upper_bounds: dict[RealVariable | BinVariable | IntVariable, float | None] = dict()
+        # affine constraints are also kept as rows of A x <= b
+        self._linear_rows: list[int] = list()
+        self._linear_coefficients: list[dict[int, float]] = list()
+        self._linear_rhs: list[float] = list()
+        self._nonlinear_rows: list[int] = list()
+        self._linear_matrix: sparse.csr_matrix | None = None
 
-        self._integer_vars = set()
+        # equality constraints are stored once, flagged per row
+        self._equality_rows: list[bool] = list()
+        self._equality_vector: np.ndarray | None = None
+        self._equality_tolerance = 0.0
+
+        # objectives and nonlinear constraints lowered into a shared DAG
+        self._graph: ExpressionGraph | None = None
+        self._graph_outputs: list[int] = list()
+        self._compiled: CompiledGraph | None = None
+        self._dependency_index: DependencyIndex | None = None
+
+        self._variables: dict[str, RealVariable | BinVariable | IntVariable] = dict()
+        self._indexed_variables: list[RealVariable | BinVariable | IntVariable] = list()
+
+        # per variable arrays, allocated with spare room so that adding
+        # variables one at a time does not copy them every time; only the
+        # first num_vars entries are in use
+        self._storage: dict[str, np.ndarray] = {
+            "values": np.empty(0),
+            "lower_bounds": np.empty(0),
+            "upper_bounds": np.empty(0),
+            "binary": np.empty(0, dtype=bool),
+            "integer": np.empty(0, dtype=bool),
+            "real": np.empty(0, dtype=bool),
+        }
 
         self._penalty = 1e-3
 
     @property
     def num_vars(self):
-        return len(self._variables)
+        return len(self._indexed_variables)
+
+    @property
+    def _values(self) -> np.ndarray:
+        return self._storage["values"][: self.num_vars]
+
+    @property
+    def _lower_bounds(self) -> np.ndarray:
+        return self._storage["lower_bounds"][: self.num_vars]
+
+    @property
+    def _upper_bounds(self) -> np.ndarray:
+        return self._storage["upper_bounds"][: self.num_vars]
+
+    @property
+    def _binary_mask(self) -> np.ndarray:
+        return self._storage["binary"][: self.num_vars]
+
+    @property
+    def _integer_mask(self) -> np.ndarray:
+        return self._storage["integer"][: self.num_vars]
+
+    @property
+    def _real_mask(self) -> np.ndarray:
+        return self._storage["real"][: self.num_vars]
 
     @property
     def variables(self):
@@ -30,7 +86,20 @@ class Model:
 
     @property
     def variables_values(self) -> dict[RealVariable | BinVariable | IntVariable, float]:
-        return self._variables_values.copy()
+        return {var: self._values[var.index] for var in self._indexed_variables}
+
+    @property
+    def values_vector(self) -> np.ndarray:
+        """Current variable values ordered by variable index."""
+        return self._values.copy()
+
+    @property
+    def lower_bounds(self) -> np.ndarray:
+        return self._lower_bounds.copy()
+
+    @property
+    def upper_bounds(self) -> np.ndarray:
+        return self._upper_bounds.copy()
 
     @property
     def objectives(self):
@@ -54,6 +123,8 @@ class Model:
         if id > len(self._objectives):
             raise ValueError(f"ID must be between 0 and {len(self._objectives)}.")
         
+        self._graph = None
+        self._dependency_index = None
         if id == len(self._objectives):
             self._objectives.append(expression)
         else:
@@ -62,78 +133,161 @@ class Model:
     def set_objective(self, expression):
         self.set_objective_x(expression, 0)
 
-    def _set_variables_bounds(self, variables: Iterable, lb, ub):
-        self._variables_lower_bounds.update({v: lb for v in variables})
-        self._variables_upper_bounds.update({v: ub for v in variables})
+    @staticmethod
+    def quicksum(terms: Iterable):
+        """
+        Sum ``terms`` in linear time, prefer it over the builtin ``sum`` when
+        building large expressions.
+
+        :param terms: constants, variables or expressions
+        :type terms: Iterable
+        :return: the sum of terms
+        :rtype: LinearSum | Sum
+        """
+        return quicksum(terms)
+
+    def _register_variables(self, variables: Iterable[RealVariable | BinVariable | IntVariable]):
+        variables = list(variables)
+        start = self.num_vars
+        stop = start + len(variables)
+
+        capacity = len(self._storage["values"])
+        reallocated = stop > capacity
+        if reallocated:
+            capacity = max(stop, 2 * capacity)
+            for name, array in self._storage.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:start] = array[:start]
+                self._storage[name] = grown
+
+        types = [var.type for var in variables]
+        storage = self._storage
+        storage["values"][start:stop] = [var.value for var in variables]
+        storage["lower_bounds"][start:stop] = [var.lb for var in variables]
+        storage["upper_bounds"][start:stop] = [var.ub for var in variables]
+        storage["binary"][start:stop] = [t is VarType.BINARY for t in types]
+        storage["integer"][start:stop] = [t is VarType.INTEGER for t in types]
+        storage["real"][start:stop] = [t is VarType.REAL for t in types]
+
+        self._indexed_variables.extend(variables)
+        for var in variables:
+            self._variables[var.name] = var
+        self._linear_matrix = None
+        self._dependency_index = None
+
+        # variables point to the values storage, all of them when it was
+        # reallocated
+        first = 0 if reallocated else start
+        for index in range(first, stop):
+            self._indexed_variables[index].bind(storage["values"], index)
 
     def create_binary_variables(self, name: str, data: list):
         new_vars = {val: BinVariable(name + str(val)) for val in data}
-        for v in new_vars.values():
-            self._variables[v.name] = v
-
-        self._set_variables_bounds(new_vars.values(), 0, 1)
-        self._integer_vars.update([var for var in new_vars.values()])
+        self._register_variables(new_vars.values())
 
         return new_vars
 
     def create_integer_variables(self, name: str, data: list, lb=None, ub=None):
         new_vars = {val: IntVariable(name + str(val), lb=lb, ub=ub) for val in data}
-        for v in new_vars.values():
-            self._variables[v.name] = v
-
-        self._set_variables_bounds(new_vars.values(), lb, ub)
-        self._integer_vars.update([var for var in new_vars.values()])
+        self._register_variables(new_vars.values())
 
         return new_vars
 
     def create_real_variables(self, name: str, data: list, lb=None, ub=None):
         new_vars = {val: RealVariable(name + str(val), lb=lb, ub=ub) for val in data}
-        for v in new_vars.values():
-            self._variables[v.name] = v
-
-        self._set_variables_bounds(new_vars.values(), lb, ub)
+        self._register_variables(new_vars.values())
 
         return new_vars
 
     def create_binary_variable(self, name: str):
         new_var = BinVariable(name)
-        self._variables[new_var.name] = new_var
-        self._variables_lower_bounds[new_var] = 0
-        self._variables_upper_bounds[new_var] = 1
-        self._integer_vars.add(new_var)
+        self._register_variables([new_var])
         return new_var
 
     def create_integer_variable(self, name: str, lb=None, ub=None):
         new_var = IntVariable(name, lb=lb, ub=ub)
-        self._variables[new_var.name] = new_var
-        self._variables_lower_bounds[new_var] = lb
-        self._variables_upper_bounds[new_var] = ub
-        self._integer_vars.add(new_var)
+        self._register_variables([new_var])
         return new_var
 
     def create_real_variable(self, name: str, lb=None, ub=None):
         new_var = RealVariable(name, lb=lb, ub=ub)
-        self._variables[new_var.name] = new_var
-        self._variables_lower_bounds[new_var] = lb
-        self._variables_upper_bounds[new_var] = ub
+        self._register_variables([new_var])
         return new_var
 
+    def __getstate__(self) -> dict:
+        # generated functions cannot be pickled, they are compiled again
+        state = self.__dict__.copy()
+        state["_compiled"] = None
+        return state
+
     def copy(self):
-        return deepcopy(self)
+        # copied through the flat encoding, which does not recurse into the
+        # expressions as deepcopy does
+        from .serialization import model_arrays, model_from_arrays
+
+        try:
+            arrays = model_arrays(self)
+        except TypeError:
+            # expressions holding objects the encoding does not support
+            return deepcopy(self)
+        return model_from_arrays(arrays)
+
+    def clip_values(self, values: np.ndarray) -> np.ndarray:
+        """
+        Project values onto the variables bounds, rounding integer variables
+        and thresholding binary ones at 0.5.
+
+        :param values: a vector of num_vars values or a
+            (population x num_vars) matrix
+        :type values: np.ndarray
+        :return: clipped copy of values
+        :rtype: np.ndarray
+        """
+        return self._clip_columns(np.asarray(values, dtype=float), slice(None))
+
+    def _clip_columns(self, values: np.ndarray, columns) -> np.ndarray:
+        integer = self._integer_mask[columns]
+        binary = self._binary_mask[columns]
+
+        clipped = np.clip(values, self._lower_bounds[columns], self._upper_bounds[columns])
+        clipped[..., integer] = np.round(clipped[..., integer])
+        clipped[..., binary] = clipped[..., binary] >= 0.5
+        return clipped
+
+    def set_values_vector(self, values: np.ndarray):
+        """
+        Set every variable value at once.
+
+        :param values: num_vars values ordered by variable index
+        :type values: np.ndarray
+        """
+        self._values[:] = self.clip_values(values)
 
     def set_variables_values(self, var_values: dict[BinVariable | IntVariable | RealVariable, int | float]):
-        for var, val in var_values.items():
+        columns = list()
+        for var in var_values:
             if var.name not in self._variables:
                 raise ValueError(f"Variable {var} not found in model.")
+            columns.append(self._variables[var.name].index)
 
-            var.set_value(val)
-            self._variables_values[var] = var.value
+        columns = np.array(columns, dtype=int)
+        values = np.fromiter(var_values.values(), dtype=float, count=len(columns))
+        self._values[columns] = self._clip_columns(values, columns)
 
     def get_variables_values(self) -> dict[str, int | float]:
-        return {var.name: value for var, value in self._variables_values.items()}
+        return {var.name: self._values[var.index] for var in self._indexed_variables}
 
-    def set_constraint_violation_penalty(self, value: float):
-        self._penalty = value
+    def get_random_values(self, size: int | None = None) -> np.ndarray:
+        """
+        Draw uniformly distributed values within the variables bounds.
+
+        :param size: number of candidates, defaults to a single vector
+        :type size: int | None, optional
+        :return: a num_vars vector or a (size x num_vars) matrix
+        :rtype: np.ndarray
+        """
+        shape = None if size is None else (size, self.num_vars)
+        return np.random.uniform(self._lower_bounds, self._upper_bounds, shape)
 
     def get_random_variables_values(self) -> dict[BinVariable | IntVariable | RealVariable, int | float]:
         return {
@@ -142,8 +296,196 @@ class Model:
         }
 
     def set_random_variables_values(self):
-        for var in self._variables.values():
-            self._variables_values[var] = var.set_random_value()
+        self._values[:] = self.get_random_values()
+
+    def evaluate_population(self, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluate objectives and constraints of many candidates in one call.
+
+        :param values: (population x num_vars) matrix, one candidate per row,
+            columns ordered by variable index
+        :type values: np.ndarray
+        :return: (population x num_objectives) objective values and
+            (population x num_constraints) constraint violations
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        population = values.shape[0]
+
+        results = self.compiled_evaluator(values)
+        num_objectives = len(self._objectives)
+
+        objectives = np.empty((population, num_objectives))
+        for column in range(num_objectives):
+            objectives[:, column] = np.real(results[column])
+
+        violations = np.empty((population, len(self._constraints)))
+        if self._linear_rows:
+            matrix, rhs = self.linear_constraints
+            violations[:, self._linear_rows] = self._constraint_violations(
+                (matrix @ values.T).T - rhs, self._linear_rows
+            )
+
+        if self._nonlinear_rows:
+            constraint_values = [
+                np.broadcast_to(value, (population,))
+                for value in results[num_objectives:]
+            ]
+            violations[:, self._nonlinear_rows] = self._constraint_violations(
+                np.column_stack(constraint_values), self._nonlinear_rows
+            )
+
+        return objectives, violations
+
+    @property
+    def expression_graph(self) -> ExpressionGraph:
+        """
+        Objectives and nonlinear constraints as a single hash-consed graph,
+        built on first use.
+        """
+        if self._graph is None:
+            graph = ExpressionGraph()
+            self._graph_outputs = [graph.add(obj) for obj in self._objectives] + [
+                graph.add(self._constraints[row]) for row in self._nonlinear_rows
+            ]
+            self._graph = graph
+            self._compiled = None
+
+        return self._graph
+
+    @property
+    def compiled_evaluator(self) -> CompiledGraph:
+        """
+        Objectives and nonlinear constraints compiled into a single
+        straight-line function, see :class:`CompiledGraph`. It is built on
+        first use and kept until the expressions change.
+        """
+        graph = self.expression_graph
+        if self._compiled is None:
+            self._compiled = CompiledGraph(graph, self._graph_outputs)
+
+        return self._compiled
+
+    @property
+    def dependency_index(self) -> DependencyIndex:
+        """
+        Affine rows, nonlinear constraints and objective terms depending on
+        every variable, built on first use.
+        """
+        if self._dependency_index is None:
+            graph = self.expression_graph
+            num_objectives = len(self._objectives)
+            matrix, _ = self.linear_constraints
+            self._dependency_index = DependencyIndex(
+                graph,
+                self._graph_outputs[:num_objectives],
+                self._graph_outputs[num_objectives:],
+                matrix,
+                self.num_vars,
+            )
+
+        return self._dependency_index
+
+    def incremental_evaluator(self, values: np.ndarray) -> IncrementalEvaluator:
+        """
+        Evaluate a population once and keep its objective values and
+        constraint violations up to date as candidates change.
+
+        :param values: (population x num_vars) matrix, one candidate per row
+        :type values: np.ndarray
+        :rtype: IncrementalEvaluator
+        """
+        return IncrementalEvaluator(self, values)
+
+    @property
+    def linear_constraints(self) -> tuple[sparse.csr_matrix, np.ndarray]:
+        """
+        Affine constraints as the sparse system ``A x <= b``, one row per
+        affine entry of the constraints list; rows of equality constraints,
+        see :attr:`equality_rows`, stand for ``A x = b``.
+        """
+        if self._linear_matrix is None:
+            rows, columns, data = list(), list(), list()
+            for row, coefficients in enumerate(self._linear_coefficients):
+                rows.extend([row] * len(coefficients))
+                columns.extend(coefficients.keys())
+                data.extend(coefficients.values())
+
+            self._linear_matrix = sparse.csr_matrix(
+                (data, (rows, columns)),
+                shape=(len(self._linear_coefficients), self.num_vars),
+            )
+            self._linear_rhs_vector = np.array(self._linear_rhs, dtype=float)
+
+        return self._linear_matrix, self._linear_rhs_vector
+
+    def _insert_constraint(self, constraint, equality: bool = False):
+        form = affine_form(constraint)
+        if form is None:
+            self._nonlinear_rows.append(len(self._constraints))
+            self._graph = None
+            self._dependency_index = None
+        else:
+            coefficients, constant = form
+            self._linear_rows.append(len(self._constraints))
+            self._linear_coefficients.append(coefficients)
+            self._linear_rhs.append(-constant)
+            self._linear_matrix = None
+            self._dependency_index = None
+
+        self._constraints.append(constraint)
+        self._equality_rows.append(equality)
+        self._equality_vector = None
+
+    @property
+    def equality_rows(self) -> np.ndarray:
+        """Mask of the constraints in the form ``h(x) = 0``."""
+        if self._equality_vector is None:
+            self._equality_vector = np.array(self._equality_rows, dtype=bool)
+
+        return self._equality_vector
+
+    @property
+    def equality_tolerance(self) -> float:
+        return self._equality_tolerance
+
+    def set_equality_tolerance(self, value: float):
+        """
+        Residual of equality constraints below which they are satisfied.
+
+        :param value: non negative tolerance
+        :type value: float
+        """
+        if value < 0:
+            raise ValueError("Equality tolerance must be non negative.")
+        self._equality_tolerance = float(value)
+
+    def _constraint_violations(self, constraint_values: np.ndarray, rows) -> np.ndarray:
+        """
+        Violation of the constraints ``rows``: ``max(0, g(x))`` for
+        ``g(x) <= 0`` and ``max(0, |h(x)| - tolerance)`` for ``h(x) = 0``.
+        Complex values, from fractional powers of negative numbers, are
+        measured by their magnitude.
+        """
+        real = np.real(constraint_values)
+        violations = np.fmax(0.0, real)
+
+        equality = self.equality_rows[rows]
+        if equality.any():
+            violations[..., equality] = np.fmax(
+                0.0, np.absolute(real[..., equality]) - self._equality_tolerance
+            )
+
+        if np.iscomplexobj(constraint_values):
+            return np.where(
+                constraint_values.imag != 0,
+                np.absolute(constraint_values),
+                violations,
+            )
+        return violations
+
+    def set_constraint_violation_penalty(self, value: float):
+        self._penalty = value
 
     def insert_lt_zero_constraint(self, constraint):
         """
@@ -153,22 +495,20 @@ class Model:
         :param constraint: left hand side of expression
         :type constraint: Expression
         """
-        self._constraints.append(constraint)
+        self._insert_constraint(constraint)
 
     def insert_eq_zero_constraint(self, constraint):
         """
         Insert a constraint in the form:
             expression = 0
 
-        As two constraints in the form:
-            expression <= 0
-            -1 * expression <= 0
+        Its violation is ``max(0, |expression| - tolerance)``, see
+        :meth:`set_equality_tolerance`.
 
         :param constraint: left hand side of expression
         :type constraint: Expression
         """
-        self._constraints.append(constraint)
-        self._constraints.append(-1*constraint)
+        self._insert_constraint(constraint, equality=True)
 
     def insert_lt_zero_constraints(self, constraints: list):
         """
@@ -179,20 +519,116 @@ class Model:
         :type constraint: Expression
         """
         for cnstrt in constraints:
-            self._constraints.append(cnstrt)
+            self._insert_constraint(cnstrt)
 
     def insert_eq_zero_constraints(self, constraints: list):
         """
         Insert a constraint in the form:
             expression = 0
 
-        As two constraints in the form:
-            expression <= 0
-            -1 * expression <= 0
+        Its violation is ``max(0, |expression| - tolerance)``, see
+        :meth:`set_equality_tolerance`.
 
         :param constraint: left hand side of expression
         :type constraint: Expression
         """
         for cnstrt in constraints:
-            self._constraints.append(cnstrt)
-            self._constraints.append(-1*cnstrt)
\ No newline at end of file
+            self._insert_constraint(cnstrt, equality=True)
+
+    def presolve(self) -> dict:
+        """
+        Simplify the affine constraints before solving:
+
+            - single variable rows become bounds of their variable, rounded
+              for integer and binary variables;
+            - constant rows and inequalities holding for any values within
+              the bounds are dropped;
+            - rows violated for any values within the bounds are kept and
+              reported as infeasible.
+
+        Call it before creating an optimizer, which reads the bounds once.
+
+        :return: ``removed`` and ``infeasible`` constraints, by their
+            position before presolve, and the ``tightened`` bounds by
+            variable name
+        :rtype: dict
+        """
+        lower, upper = self._lower_bounds.copy(), self._upper_bounds.copy()
+        integral = self._integer_mask | self._binary_mask
+        tolerance = self._equality_tolerance
+        removed, infeasible = set(), set()
+
+        rows = list()
+        for row, coefficients, rhs in zip(
+            self._linear_rows, self._linear_coefficients, self._linear_rhs
+        ):
+            coefficients = {index: a for index, a in coefficients.items() if a != 0}
+            equality = self._equality_rows[row]
+
+            if not coefficients:
+                violated = abs(rhs) > tolerance if equality else rhs < 0
+                (infeasible if violated else removed).add(row)
+                continue
+
+            if len(coefficients) > 1:
+                rows.append((row, coefficients, rhs))
+                continue
+
+            ((index, a),) = coefficients.items()
+            if equality:
+                low, high = sorted([(rhs - tolerance) / a, (rhs + tolerance) / a])
+            elif a > 0:
+                low, high = -np.inf, rhs / a
+            else:
+                low, high = rhs / a, np.inf
+
+            low, high = max(lower[index], low), min(upper[index], high)
+            if integral[index]:
+                low, high = np.ceil(low - 1e-9), np.floor(high + 1e-9)
+            if low > high:
+                infeasible.add(row)
+                continue
+
+            lower[index], upper[index] = low, high
+            removed.add(row)
+
+        for row, coefficients, rhs in rows:
+            if self._equality_rows[row]:
+                continue
+            smallest = sum(a * (lower[i] if a > 0 else upper[i]) for i, a in coefficients.items())
+            largest = sum(a * (upper[i] if a > 0 else lower[i]) for i, a in coefficients.items())
+            if largest <= rhs:
+                removed.add(row)
+            elif smallest > rhs:
+                infeasible.add(row)
+
+        tightened = dict()
+        for index in np.flatnonzero((lower != self._lower_bounds) | (upper != self._upper_bounds)):
+            var = self._indexed_variables[index]
+            var.lb, var.ub = lower[index], upper[index]
+            tightened[var.name] = (float(lower[index]), float(upper[index]))
+        self._lower_bounds[:], self._upper_bounds[:] = lower, upper
+        self._values[:] = self.clip_values(self._values)
+
+        if removed:
+            constraints = [
+                (constraint, equality)
+                for row, (constraint, equality) in enumerate(
+                    zip(self._constraints, self._equality_rows)
+                )
+                if row not in removed
+            ]
+            self._constraints, self._equality_rows = list(), list()
+            self._linear_rows, self._linear_coefficients, self._linear_rhs = list(), list(), list()
+            self._nonlinear_rows = list()
+            self._linear_matrix = None
+            self._graph = None
+            self._dependency_index = None
+            for constraint, equality in constraints:
+                self._insert_constraint(constraint, equality)
+
+        return {
+            "removed": sorted(removed),
+            "infeasible": sorted(infeasible),
+            "tightened": tightened,
+        }
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def iteration_penalties(
+    violations: np.ndarray,
+    iter: int,
+    c: float = 0.5,
+    alpha: float = 2,
+    a: float = 150,
+    b: float = 10,
+) -> np.ndarray:
+    """
+    Iteration dependent penalty of the PSO:
+
+        -Ci * sum(phi(q_j) * q_j ** gamma(q_j))
+
+    with ``Ci = (c * iter) ** alpha``, ``phi(q) = a * (1 - 1 / e^q) + b`` and
+    ``gamma(q) = 1 if q <= 1 else 2``, ``q_j`` being the violation of the
+    j-th constraint.
+
+    :param violations: (population x num_constraints) constraint violations
+    :type violations: np.ndarray
+    :param iter: current iteration
+    :type iter: int
+    :return: one penalty per candidate
+    :rtype: np.ndarray
+    """
+    violations = np.atleast_2d(violations)
+    Ci = (c * iter) ** alpha
+
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        phi = a * (1 - 1 / np.exp(violations)) + b
+        powered = np.where(violations <= 1, violations, violations * violations)
+        return -1 * Ci * (phi * powered).sum(axis=1)
+
+
+def max_normalized_penalties(violations: np.ndarray) -> np.ndarray:
+    """
+    Penalty of the DE: the violations of each constraint are divided by
+    the largest violation of that constraint in the population, and the
+    penalty is the negated mean over the constraints. Constraints nobody
+    violates are ignored.
+
+    :param violations: (population x num_constraints) constraint violations
+    :type violations: np.ndarray
+    :return: one penalty per candidate
+    :rtype: np.ndarray
+    """
+    violations = np.atleast_2d(violations)
+    population, num_constraints = violations.shape
+    if num_constraints == 0 or population == 0:
+        return np.zeros(population)
+
+    max_violations = violations.max(axis=0)
+    violated = max_violations != 0
+
+    with np.errstate(invalid="ignore"):
+        normalized = violations[:, violated] / max_violations[violated]
+    return -1 * normalized.sum(axis=1) / num_constraints
@@ -12,33 +12,67 @@ from pprint import pprint
 from tqdm import tqdm
 from matplotlib import pyplot as plt
 
-def normalize_evolution_data(evolution_data: list[list[list[float]]]):
-    objective_pen = [[sum(val) for val in it] for it in evolution_data]
-    objectives = [[val[0] for val in it] for it in evolution_data]
-    penalties = [[val[1] for val in it] for it in evolution_data]
-
-    for data in objective_pen:
-        data.sort()
-    for data in objectives:
-        data.sort()
-    for data in penalties:
-        data.sort()
-
-    objective_pen = list(map(list, zip(*objective_pen)))
-    objectives = list(map(list, zip(*objectives)))
-    penalties = list(map(list, zip(*penalties)))
-
-    objective_pen = np.array(objective_pen)
+from solver.recording import load_evolution_data
+from solver.results_store import ResultsStore
+
+# scenarios by number of variables, constraint counts changed when equalities
+# stopped being stored as two inequalities
+CENARIOS = {87: "A", 181: "B", 251: "C", 435: "D", 559: "E", 774: "F"}
+
+def is_summary(evolution_data) -> bool:
+    """Whether evolution data was recorded by an EvolutionSummaryRecorder."""
+    return isinstance(evolution_data, dict) and "summary" in evolution_data
+
+
+def order_statistics(evolution_data: dict) -> tuple[list[str], np.ndarray]:
+    """
+    Names and (iterations x columns x statistics) values of the ordered
+    statistics, minimum to maximum, of summarised evolution data.
+    """
+    summary = evolution_data["summary"]
+    ordered = [k for k, name in enumerate(summary["statistics"]) if name != "mean"]
+    values = np.asarray(summary["values"], dtype=float)[:, :, ordered]
+    return [summary["statistics"][k] for k in ordered], values
+
+
+def evolution_points(evolution_data) -> list[list[float]]:
+    """
+    Every recorded (objective, penalty) pair; summarised data only has the
+    best candidate of every iteration and the fully kept iterations.
+    """
+    if not is_summary(evolution_data):
+        return [val for it in evolution_data for val in it]
+
+    summary = evolution_data["summary"]
+    points = list(summary["best"])
+    for values in summary["full_data"].values():
+        points.extend(values)
+    return points
+
+
+def normalize_evolution_data(evolution_data: list[list[list[float]]] | np.ndarray | dict):
+    if is_summary(evolution_data):
+        # ordered statistics take the place of the sorted population
+        _, values = order_statistics(evolution_data)
+        objective_pen = values[:, -1].T
+        objectives = values[:, 0].T
+        penalties = values[:, -2].T
+    else:
+        # (iterations x population x 2) to (population x iterations), each
+        # iteration sorted
+        evolution_data = np.asarray(evolution_data)
+        objective_pen = np.sort(evolution_data.sum(axis=2), axis=1).T
+        objectives = np.sort(evolution_data[:, :, 0], axis=1).T
+        penalties = np.sort(evolution_data[:, :, 1], axis=1).T
+
     min_value = objective_pen.min()
     max_value = objective_pen.max()
     objective_pen = (objective_pen - min_value) / (max_value - min_value)
 
-    objectives = np.array(objectives)
     min_value = objectives.min()
     max_value = objectives.max()
     objectives = (objectives - min_value) / (max_value - min_value)
 
-    penalties = np.array(penalties)
     min_value = penalties.min()
     max_value = penalties.max()
     penalties = (penalties - min_value) / (max_value - min_value)
@@ -46,39 +80,21 @@ def normalize_evolution_data(evolution_data: list[list[list[float]]]):
     return objective_pen, objectives, penalties
 
 
+def get_best_execution_data(params: tuple, algo: str = "de"):
+    """Evolution data of the run of a configuration with the best objectives."""
+    return store.evolution_data(store.best_run(algo, params))
+
+
 def create_heatmaps(parameters: list, algo: str):
     if len(parameters) == 0:
         return
 
-    def get_best_execution_data(params: tuple, algo: str="de"):
-        iters, indiv, vars, constrs = params
-        experiment_files = [
-            path + f"{iters}it_{indiv}_ind{vars}var_{constrs}cnstr_{i}_{algo}.json"
-            for i in range(10)
-        ]
-
-        evo_data = [[[]]]
-        objectives = None
-        for experiment in experiment_files:
-            dados = load_file_data(experiment)
-            obj = dados["objectives"]
-            if objectives is None:
-                objectives = obj
-                evo_data = dados["evo_data"]
-            if sum(obj) > sum(objectives):
-                objectives = obj
-                evo_data = dados["evo_data"]
-
-        return evo_data
-
-    cenarios = {(87, 86): "A", (181, 153): "B", (251, 177): "C", (435, 268): "D", (559, 300): "E", (774, 420): "F"}
-
     fig, axn = plt.subplots(3, 2, sharex=True, sharey=True, figsize=(9, 9))
     
     for i in range(len(parameters)):
         par = parameters[i]
         iter, pop, vars, constrs = par
-        cenario = cenarios[(vars, constrs)]
+        cenario = CENARIOS[vars]
 
         xlabels = ['{0:d}'.format(i) for i in range(1, iter+1, iter//10)]
         xticks = [i for i in range(1, iter+1, iter//10)]
@@ -86,6 +102,9 @@ def create_heatmaps(parameters: list, algo: str):
         yticks = [i for i in range(1, pop+1, pop//10)]
 
         evo_data = get_best_execution_data(par, algo)
+        if is_summary(evo_data):
+            ylabels = order_statistics(evo_data)[0]
+            yticks = [i + 0.5 for i in range(len(ylabels))]
         pen_obj, objs, pens = normalize_evolution_data(evo_data)
         ax = plt.subplot(3, 2, i+1)
         sns.heatmap(objs, annot=False, ax=ax)
@@ -104,32 +123,32 @@ def create_heatmaps(parameters: list, algo: str):
     plt.close()
 
 def load_file_data(file_name: str):
+    """
+    Load a results file. Evolution data recorded to a binary file, either
+    given directly or referenced by the results, is opened memory-mapped.
+    """
+    if file_name.endswith(".npy"):
+        return {"evo_data": load_evolution_data(file_name)}
+
     with open(file_name, "r") as f:
         data = json.loads(f.read())
 
+    if isinstance(data.get("evo_data"), str):
+        data["evo_data"] = load_evolution_data(data["evo_data"])
+
     return data
 
 
 def create_resume_table(pso_params: list, de_params: list):
     def extract_data(params: tuple, algo: str="de"):
-        iters, indiv, vars, constrs = params
-        experiment_files = [
-            path + f"{iters}it_{indiv}_ind{vars}var_{constrs}cnstr_{i}_{algo}.json"
-            for i in range(10)
+        indiv = params[1]
+        stats = store.statistics(algo, params)
+        times = [stats[name] / 60 for name in ("time_mean", "time_std")]
+        objectives = [
+            stats[name] / 1000
+            for name in ("objective_min", "objective_max", "objective_mean", "objective_std")
         ]
-
-        solve_times = list()
-        objectives = list()
-        penalties = list()
-        for experiment in experiment_files:
-            dados = load_file_data(experiment)
-            solve_times.append(dados["solve_time"]/60)
-            objectives.append(dados["objectives"][0]/1000)
-            penalties.append(dados["objectives"][1]/1000)
-
-        return indiv, np.mean(solve_times), np.std(solve_times), np.min(objectives), np.max(objectives), np.mean(objectives), np.std(objectives)
-
-    cenarios ={(87, 86): "A", (181, 153): "B", (251, 177): "C", (435, 268): "D", (559, 300): "E", (774, 420): "F"}
+        return (indiv, *times, *objectives)
 
     ps_data = ""
     de_data = ""
@@ -138,7 +157,6 @@ def create_resume_table(pso_params: list, de_params: list):
         pso_param = pso_params[i]
         de_param = de_params[i]
         vars = pso_param[2]
-        constrs = pso_param[3]
 
         ps_pop, ps_time, ps_time_std, ps_min, ps_max, ps_mean, ps_std = extract_data(pso_param, "pso")
         de_pop, de_time, de_time_std, de_min, de_max, de_mean, de_std = extract_data(de_param, "de")
@@ -155,9 +173,9 @@ def create_resume_table(pso_params: list, de_params: list):
             "\\begin{table}[h]\n"
             + "\\centering\n"
             + "\\caption{Resultados dos experimentos para os modelos do cenário "
-            + f"{cenarios[(vars, constrs)]} otimizados com {algo}"
+            + f"{CENARIOS[vars]} otimizados com {algo}"
             + "\\label{"
-            + f"tab:resultado_cenario_{cenarios[(vars, constrs)]}_{algo}"
+            + f"tab:resultado_cenario_{CENARIOS[vars]}_{algo}"
             + "}}\\vspace{0.5cm}\n"
             + "\\begin{tabular}{rrrrr}\n"
             + "\\hline\n"
@@ -170,9 +188,9 @@ def create_resume_table(pso_params: list, de_params: list):
             "\\begin{table}[h]\n"
             + "\\centering\n"
             + "\\caption{Tempo relativo entre a otimização via PSO e NDE"
-            + f" para o cenário {cenarios[(vars, constrs)]}"
+            + f" para o cenário {CENARIOS[vars]}"
             + "\\label{"
-            + f"tab:comparacao_cenario_{cenarios[(vars, constrs)]}"
+            + f"tab:comparacao_cenario_{CENARIOS[vars]}"
             + "}}\n\\vspace{0.5cm}\n"
             + "\\begin{tabular}{rrr}\n"
             + "\\hline\n"
@@ -186,42 +204,21 @@ def create_resume_table(pso_params: list, de_params: list):
             + "\\end{table}"
         )
 
-    with open(f"analisys/{cenarios[(vars, constrs)]}_ps_table.tex", "w") as f:
+    with open(f"analisys/{CENARIOS[vars]}_ps_table.tex", "w") as f:
         f.write(header("PSO"))
         f.write(ps_data)
         f.write(tail())
-    with open(f"analisys/{cenarios[(vars, constrs)]}_de_table.tex", "w") as f:
+    with open(f"analisys/{CENARIOS[vars]}_de_table.tex", "w") as f:
         f.write(header("NDE"))
         f.write(de_data)
         f.write(tail())
-    with open(f"analisys/{cenarios[(vars, constrs)]}_comp_table.tex", "w") as f:
+    with open(f"analisys/{CENARIOS[vars]}_comp_table.tex", "w") as f:
         f.write(header_2())
         f.write(comp_data)
         f.write(tail())
 
 
 def create_paretos(parameters: list, algo: str):
-    def get_best_execution_data(params: tuple, algo: str="de"):
-        iters, indiv, vars, constrs = params
-        experiment_files = [
-            path + f"{iters}it_{indiv}_ind{vars}var_{constrs}cnstr_{i}_{algo}.json"
-            for i in range(10)
-        ]
-
-        evo_data = [[[]]]
-        objectives = None
-        for experiment in experiment_files:
-            dados = load_file_data(experiment)
-            obj = dados["objectives"]
-            if objectives is None:
-                objectives = obj
-                evo_data = dados["evo_data"]
-            if sum(obj) > sum(objectives):
-                objectives = obj
-                evo_data = dados["evo_data"]
-
-        return evo_data
-
     def pareto_frontier(data, maxX = True, maxY = True):
         myList = sorted(data, reverse=maxX)
         p_front = [myList[0]]    
@@ -236,17 +233,15 @@ def create_paretos(parameters: list, algo: str):
         p_frontY = [pair[1] for pair in p_front]
         return p_frontX, p_frontY
 
-    cenarios = {(87, 86): "A", (181, 153): "B", (251, 177): "C", (435, 268): "D", (559, 300): "E", (774, 420): "F"}
-
     fig, axn = plt.subplots(3, 3, sharex=True, sharey=True, figsize=(10, 10))
 
     for i in range(len(parameters)):
         par = parameters[i]
         iter, pop, vars, constrs = par
-        cenario = cenarios[(vars, constrs)]
+        cenario = CENARIOS[vars]
 
         evo_data = get_best_execution_data(par, algo)
-        data = [val for it in evo_data for val in it]
+        data = evolution_points(evo_data)
         pareto_x, pareto_y = pareto_frontier(data)
         # pen_obj, objs, pens = normalize_evolution_data(evo_data)
         ax = plt.subplot(3, 3, i+1)
@@ -264,14 +259,12 @@ def create_paretos(parameters: list, algo: str):
 #  'solution_variables_values', 'population', 'max_iterations']
 
 path = "results/"
-files = os.listdir(path)
-pso_files = [f for f in files if f.endswith("pso.json")]
-de_files = [f for f in files if f.endswith("de.json")]
-
-regex = r"(\d+)it_(\d+)_ind(\d+)var_(\d+)"
+# results files are parsed once, later runs only ingest new or changed files
+store = ResultsStore(path + "results.sqlite")
+store.ingest(path)
 
-all_pso_params = list(set(re.match(regex, arq).groups() for arq in pso_files))
-all_de_params = list(set(re.match(regex, arq).groups() for arq in de_files))
+all_pso_params = [tuple(str(v) for v in p) for p in store.configurations("pso")]
+all_de_params = [tuple(str(v) for v in p) for p in store.configurations("de")]
 
 # iterations, population, variables, constraints
 # variables = {"87", "181", "251", "435", "559", "774"}
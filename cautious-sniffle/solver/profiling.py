@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class PhaseProfiler:
+    """
+    Cumulative wall time and number of runs of the phases of an optimizer,
+    plus the number of candidate evaluations.
+
+    Phases used by the optimizers: ``population_creation``, ``evaluation``,
+    ``penalty``, ``selection``, ``update`` and ``recording``.
+    """
+
+    def __init__(self) -> None:
+        self.times: dict[str, float] = dict()
+        self.calls: dict[str, int] = dict()
+        self.evaluations = 0
+        self.total_time = 0.0
+
+    @contextmanager
+    def phase(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count_evaluations(self, evaluations: int):
+        self.evaluations += evaluations
+
+    def summary(self) -> dict:
+        """
+        :return: time and calls of every phase, the evaluations made and
+            evaluations per second of evaluation phase and of total time
+        :rtype: dict
+        """
+        evaluation_time = self.times.get("evaluation", 0.0)
+        return {
+            "phases": {
+                name: {"time": self.times[name], "calls": self.calls[name]}
+                for name in self.times
+            },
+            "evaluations": self.evaluations,
+            "evaluations_per_second": (
+                self.evaluations / evaluation_time if evaluation_time else 0.0
+            ),
+            "total_time": self.total_time,
+            "overall_evaluations_per_second": (
+                self.evaluations / self.total_time if self.total_time else 0.0
+            ),
+        }
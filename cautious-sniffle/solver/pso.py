@@ -1,28 +1,58 @@
 from __future__ import annotations
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from multiprocessing import cpu_count
-
 import random as rd
 import numpy as np
 
-from copy import deepcopy
+from multiprocessing import cpu_count
 from tqdm import tqdm
 from time import time
 
 from solver.de import Individual
 
-from .variables import RealVariable, BinVariable, IntVariable
+from .checkpoint import (
+    CheckpointWriter,
+    load_checkpoint,
+    random_states,
+    recording_state,
+    restore_random_states,
+    restore_recording,
+)
 from .model import Model
-from .expression import Expression
+from .penalties import iteration_penalties
+from .profiling import PhaseProfiler
+from .stopping import StoppingRules
+from .workers import SliceRunner
 
 
 class Particle:
-    def __init__(self, model: Model, c1: float = 2, r1: float | None = None) -> None:
+    def __init__(
+        self,
+        model: Model,
+        position: np.ndarray,
+        velocity: np.ndarray,
+        best_position: np.ndarray,
+        c1: float = 2,
+        r1: float | None = None,
+    ) -> None:
+        """
+        A particle only holds its state vectors; the model, shared by the
+        whole swarm, is used read-only to evaluate them.
+
+        :param model: Model being solved
+        :type model: Model
+        :param position: row of the swarm positions matrix
+        :type position: np.ndarray
+        :param velocity: row of the swarm velocities matrix
+        :type velocity: np.ndarray
+        :param best_position: row of the swarm personal bests matrix
+        :type best_position: np.ndarray
+        """
         self._current_iter = 1
         self._model = model
-        self._best_pos = self._model.variables_values
-        self._best_pos_obj = sum(self.objective_values)
+        self.position = position
+        self.velocity = velocity
+        self._best_pos = best_position
+        self._best_pos_obj = -np.inf
 
         if r1 is None:
             self.r1 = rd.uniform(0, 1)
@@ -30,9 +60,6 @@ class Particle:
             self.r1 = np.clip(r1, 0, 1)
 
         self.c1 = c1
-        self.variables_speed: dict[
-            RealVariable | BinVariable | IntVariable, float
-        ] = dict()
         self.initialize_variables_and_speeds()
 
     @property
@@ -40,115 +67,56 @@ class Particle:
         return self.get_objective_values()
 
     @property
-    def Pbest(self) -> dict[RealVariable | BinVariable | IntVariable, float]:
+    def Pbest(self) -> np.ndarray:
         # p_best
-        return deepcopy(self._best_pos)
+        return self._best_pos.copy()
 
     @property
     def Pbest_obj(self):
         return self._best_pos_obj
 
     def get_objective_values(self) -> list[float]:
-        self._model.set_constraint_violation_penalty(
-            self._evaluate_constraint_penalties(self._current_iter)
-        )
-        return self._model.objective_values
+        objectives, violations = self._model.evaluate_population(self.position)
+        return objectives[0].tolist() + [
+            self.penalize_violations(violations[0], self._current_iter)
+        ]
 
-    def _evaluate_constraint_penalties(
-        self, iter: int, c: float = 0.5, alpha=2, a=150, b=10
+    @staticmethod
+    def penalize_violations(
+        violations, iter: int, c: float = 0.5, alpha=2, a=150, b=10
     ) -> float:
-        Ci = (c * iter) ** alpha
-
-        def qj(x: Expression) -> float:
-            try:
-                val = x.value
-            except AttributeError:
-                val = x
-            try:
-                ret_val = max(0.0, val)
-            except TypeError:
-                ret_val = max(0.0, np.absolute(val))
-            return ret_val
-
-        def phi(qj) -> float:
-            try:
-                val = a * (1 - (1 / np.exp(qj))) + b
-            except RuntimeWarning:
-                val = 10**10
-            return val
-
-        def gamma(qj) -> float:
-            return 1 if qj <= 1 else 2
-
-        def penalty(constraint: Expression):
-            viol = qj(constraint)
-            return phi(viol) * (viol ** gamma(viol))
-
-        total_penalty = (
-            -1
-            * Ci
-            * sum(penalty(constraint) for constraint in self._model._constraints)
-        )
+        return float(iteration_penalties(violations, iter, c, alpha, a, b)[0])
 
-        return total_penalty
-
-    def _update_best_position(self, iter=0):
-        current_obj = sum(self.objective_values)
-        self._current_iter = iter
+    def _update_best_position(self, current_obj: float):
         if current_obj > self._best_pos_obj:
             self._best_pos_obj = current_obj
-            self._best_pos = self._model.variables_values
+            self._best_pos[:] = self.position
 
     def initialize_variables_and_speeds(self):
-        self._model.set_random_variables_values()
-        for var in self._model.variables:
-            self.variables_speed[var] = 0.0
+        self.position[:] = self._model.get_random_values()
+        self.velocity[:] = 0.0
+        self._best_pos[:] = self.position
+        self._best_pos_obj = -np.inf
 
-        self.position = self._model.variables_values
-        self._best_pos = self.position
-        self._best_pos_obj = sum(self.objective_values)
+    def update_variables(self, values: np.ndarray, iter=0):
+        self.position[:] = self._model.clip_values(values)
+        self._current_iter = iter
 
-    def update_variables(
-        self, var_values: dict[RealVariable | BinVariable | IntVariable, float], iter=0
-    ):
-        self._model.set_variables_values(var_values)
-        self._update_best_position(iter=iter)
+    def _compute_speed(self, r2, c2, theta, Gbest) -> np.ndarray:
+        x = self.position
+        return (
+            theta * self.velocity
+            + self.c1 * self.r1 * (self._best_pos - x)
+            + c2 * r2 * (Gbest - x)
+        )
 
     def update_variables_speed(self, r2, c2, theta, Gbest):
-        Pbest = self.Pbest
-        v = self.variables_speed
-        x = self._model.variables_values
-        r1 = self.r1
-        c1 = self.c1
-
-        def compute_speed(var: RealVariable | BinVariable | IntVariable):
-            return (
-                theta * v[var]
-                + c1 * r1 * (Pbest[var] - x[var])
-                + c2 * r2 * (Gbest[var] - x[var])
-            )
-
-        self.variables_speed = {var: compute_speed(var) for var in x}
+        self.velocity[:] = self._compute_speed(r2, c2, theta, Gbest)
 
     def update_variables_speed_and_variables(self, r2, c2, theta, Gbest, iter=0):
-        Pbest = self.Pbest
-        v = self.variables_speed
-        x = self._model.variables_values
-        r1 = self.r1
-        c1 = self.c1
-
-        def compute_speed(var: RealVariable | BinVariable | IntVariable):
-            return (
-                theta * v[var]
-                + c1 * r1 * (Pbest[var] - x[var])
-                + c2 * r2 * (Gbest[var] - x[var])
-            )
-
-        new_v = {var: compute_speed(var) for var in x}
-        new_x = {var: x[var] + new_v[var] for var in x}
-
-        self.update_variables(new_x, iter)
-        self.variables_speed = new_v
+        new_v = self._compute_speed(r2, c2, theta, Gbest)
+        self.update_variables(self.position + new_v, iter)
+        self.velocity[:] = new_v
 
 
 class ParticleSwarmOptimizer:
@@ -176,6 +144,12 @@ class ParticleSwarmOptimizer:
         :type c2: float, optional
         :param r2: learning rate weight, defaults to None
         :type r2: float, optional
+        :param workers: number of worker processes sharing the swarm,
+            defaults to the number of cores minus 2, 1 runs in-process
+        :type workers: int, optional
+        :param recorder: stores the evolution data instead of the
+            ``evolution_data`` list, e.g. an EvolutionFileRecorder
+        :type recorder: EvolutionFileRecorder, optional
         """
         self.model = model
 
@@ -184,6 +158,8 @@ class ParticleSwarmOptimizer:
         self.theta_min = kwargs.get("theta_min", 0.4)
         self.max_iterations = max_iterations
         self.c2 = kwargs.get("c2", 2)
+        self.workers = kwargs.get("workers", max(1, cpu_count() - 2))
+        self.recorder = kwargs.get("recorder", None)
 
         r2 = kwargs.get("r2", None)
         if r2 is None:
@@ -191,70 +167,282 @@ class ParticleSwarmOptimizer:
         else:
             self.r2 = np.clip(r2, 0, 1)
 
-        self._population = [
-            Particle(model.copy(), c1=self.c2, r1=self.r2)
-            for _ in tqdm(
-                range(self.num_particles), desc="Creating population", position=0
-            )
-        ]
+        self.profile = PhaseProfiler()
+        with self.profile.phase("population_creation"):
+            self._positions = np.empty((self.num_particles, model.num_vars))
+            self._velocities = np.empty((self.num_particles, model.num_vars))
+            self._best_positions = np.empty((self.num_particles, model.num_vars))
+            self._population = [
+                Particle(
+                    model,
+                    self._positions[i],
+                    self._velocities[i],
+                    self._best_positions[i],
+                    c1=self.c2,
+                    r1=self.r2,
+                )
+                for i in tqdm(
+                    range(self.num_particles), desc="Creating population", position=0
+                )
+            ]
 
         self.evolution_data: list[list[list[float]]] = list()
         self.solve_time = None
         self.solution = self.model
+        self.stop_reason: str | None = None
+        # fitness, position and penalty, replaced at once so that another
+        # thread always reads a consistent best
+        self._best: tuple[float, np.ndarray, float] = (
+            -np.inf,
+            np.zeros(model.num_vars),
+            0.0,
+        )
+
+    @property
+    def best_fitness(self) -> float:
+        return self._best[0]
+
+    @property
+    def best_position(self) -> np.ndarray:
+        return self._best[1]
+
+    def best_solution(self) -> Model:
+        """
+        Best particle evaluated so far, available at any moment of the run.
+
+        :return: copy of the model holding its values
+        :rtype: Model
+        """
+        _, position, penalty = self._best
+        solution = self.model.copy()
+        solution.set_values_vector(position)
+        solution.set_constraint_violation_penalty(penalty)
+        return solution
 
-    def optimize(self, use_convergence_criteria: bool = False):
+    def optimize(
+        self,
+        use_convergence_criteria: bool = False,
+        checkpoint: str | None = None,
+        checkpoint_every: int = 100,
+        resume_from: str | None = None,
+        stopping: StoppingRules | None = None,
+    ):
+        """
+        :param use_convergence_criteria: stop once all particles share the
+            same objective value
+        :type use_convergence_criteria: bool
+        :param checkpoint: file where the state of the run is saved every
+            ``checkpoint_every`` iterations, ``{iteration}`` is replaced by
+            the iteration number; without a recorder, the evolution data is
+            kept in a single ``.evolution`` file next to the checkpoints
+        :type checkpoint: str | None
+        :param checkpoint_every: iterations between checkpoints
+        :type checkpoint_every: int
+        :param resume_from: checkpoint to continue from, the optimizer must
+            be built with the same model, swarm size and recorder type
+        :type resume_from: str | None
+        :param stopping: time limit, target and stagnation rules, checked
+            every iteration; the cause of stopping is kept in ``stop_reason``
+        :type stopping: StoppingRules | None
+        """
         start_time = time()
+        if stopping is not None:
+            stopping.start()
+        self.stop_reason = "max_iterations"
 
-        r2 = self.r2
-        c2 = self.c2
         theta_max = self.theta_max
         theta_min = self.theta_min
         it_max = self.max_iterations
 
-        best_particle = 0
-        Gbest_obj = self._population[best_particle].Pbest_obj
-
-        for it in tqdm(range(it_max), desc="Generation", position=1):
-            Gbest_pos = self._population[best_particle].Pbest
-            Gbest_obj = sum(self._population[best_particle].objective_values)
-            theta = theta_max - (theta_max - theta_min) / it_max * it
-
-            obj_pool = list()
-            with ProcessPoolExecutor(max(1, cpu_count() - 2)) as executor:
-                futures = [
-                    executor.submit(Particle.get_objective_values, particle)
-                    for particle in self._population
-                ]
-                for future in as_completed(futures):
-                    obj_pool.append(future.result())
-
-                obj_sum = [sum(objs) for objs in obj_pool]
-                best_particle = obj_sum.index(max(obj_sum))
-                Gbest_pos = self._population[best_particle].Pbest
-
-                executor.map(
-                    lambda particle: particle.update_variables_speed_and_variables(
-                        r2, c2, theta, Gbest_pos, it
-                    ),
-                    self._population,
-                )
-
-            self.evolution_data.append(obj_pool)
-            if use_convergence_criteria:
-                if self._has_converged(obj_pool):
+        profile = self.profile
+        arrays = self._swarm_arrays()
+        first_it = 0
+        elapsed = 0.0
+        if resume_from is not None:
+            first_it, elapsed = self._restore_checkpoint(resume_from, arrays, stopping)
+
+        context = {"model": self.model, "social": self.c2 * self.r2}
+        with CheckpointWriter(checkpoint, checkpoint_every) as writer, SliceRunner(
+            context, arrays, self.num_particles, self.workers
+        ) as runner:
+            swarm = runner.arrays
+            for it in tqdm(
+                range(first_it, it_max),
+                desc="Generation",
+                position=1,
+                initial=first_it,
+                total=it_max,
+            ):
+                theta = theta_max - (theta_max - theta_min) / it_max * it
+
+                self._evaluate(runner, it + 1)
+
+                with profile.phase("selection"):
+                    best_particle = int(np.argmax(swarm["fitness"]))
+                    swarm["global_best"][:] = swarm["best_positions"][best_particle]
+                    self._update_best(swarm)
+
+                with profile.phase("update"):
+                    runner.run(_move_swarm, theta)
+
+                # moving the swarm leaves objectives and penalties untouched
+                with profile.phase("recording"):
+                    obj_pool = np.column_stack(
+                        [swarm["objectives"], swarm["penalties"]]
+                    )
+                    self._record(obj_pool)
+
+                action = None
+                if stopping is not None:
+                    stopping.update(self.best_fitness)
+                    action = stopping.check()
+                    if action == "restart":
+                        with profile.phase("population_creation"):
+                            self._restart_particles(swarm, stopping.worst(swarm["best_fitness"]))
+
+                if writer.due(it + 1):
+                    with profile.phase("recording"):
+                        self._write_checkpoint(
+                            writer, swarm, it + 1, elapsed + time() - start_time, stopping
+                        )
+
+                if action == "stop":
+                    self.stop_reason = stopping.reason
                     break
+                if use_convergence_criteria:
+                    if self._has_converged(obj_pool):
+                        self.stop_reason = "convergence"
+                        break
+
+            self._evaluate(runner, it_max)
+            self._update_best(swarm)
+
+        if self.recorder is not None:
+            self.recorder.close()
 
-        for j in range(self.num_particles):
-            p = self._population[j]
-            if sum(p.objective_values) > Gbest_obj:
-                best_particle = j
-        solution = self._population[best_particle]._model
+        for particle, best_obj in zip(self._population, arrays["best_fitness"]):
+            particle._best_pos_obj = best_obj
+            particle._current_iter = it_max
+
+        solution = self.best_solution()
         stop_time = time()
-        self.solve_time = stop_time - start_time
+        self.solve_time = elapsed + stop_time - start_time
+        profile.total_time += stop_time - start_time
 
         self.solution = solution
         return solution
 
+    def _update_best(self, swarm: dict):
+        # penalties grow with the iteration, the best so far is measured with
+        # those of the last one for fitness values to compare across iterations
+        penalties = iteration_penalties(swarm["violations"], self.max_iterations)
+        fitness = swarm["objectives"].sum(axis=1) + penalties
+        if not np.any(fitness > self._best[0]):
+            return
+
+        particle = int(np.nanargmax(fitness))
+        self._best = (
+            float(fitness[particle]),
+            swarm["positions"][particle].copy(),
+            float(penalties[particle]),
+        )
+
+    def _restart_particles(self, swarm: dict, particles: np.ndarray):
+        """Move particles to random positions, forgetting their personal bests."""
+        positions = self.model.get_random_values(len(particles))
+        swarm["positions"][particles] = positions
+        swarm["velocities"][particles] = 0.0
+        swarm["best_positions"][particles] = positions
+        swarm["best_fitness"][particles] = -np.inf
+
+    def _write_checkpoint(
+        self,
+        writer: CheckpointWriter,
+        swarm: dict,
+        iteration: int,
+        elapsed: float,
+        stopping: StoppingRules | None,
+    ):
+        arrays, metadata = recording_state(self.evolution_data, self.recorder, writer)
+        arrays.update({f"swarm_{name}": array for name, array in swarm.items()})
+        arrays["best_position"] = self._best[1]
+        metadata.update(
+            {
+                "optimizer": "pso",
+                "iteration": iteration,
+                "elapsed": elapsed,
+                "r2": float(self.r2),
+                "best": [self._best[0], self._best[2]],
+                "stopping": None if stopping is None else stopping.state(),
+                "random": random_states(),
+            }
+        )
+        writer.write(iteration, arrays, metadata)
+
+    def _restore_checkpoint(
+        self, path: str, swarm: dict, stopping: StoppingRules | None
+    ) -> tuple[int, float]:
+        """
+        Load a checkpoint into the swarm arrays.
+
+        :return: iteration to continue from and time spent before the checkpoint
+        :rtype: tuple[int, float]
+        """
+        arrays, metadata = load_checkpoint(path)
+        if metadata.get("optimizer") != "pso":
+            raise ValueError(f"{path} is not a particle swarm checkpoint.")
+
+        for name, array in swarm.items():
+            saved = arrays[f"swarm_{name}"]
+            if saved.shape != array.shape:
+                raise ValueError(
+                    f"Checkpoint {name} has shape {saved.shape}, expected {array.shape}."
+                )
+            array[...] = saved
+
+        self.r2 = metadata["r2"]
+        for particle in self._population:
+            particle.r1 = self.r2
+        best_fitness, best_penalty = metadata["best"]
+        self._best = (best_fitness, arrays["best_position"], best_penalty)
+        if stopping is not None and metadata["stopping"] is not None:
+            stopping.restore(metadata["stopping"])
+        restore_recording(arrays, metadata, self.evolution_data, self.recorder)
+        restore_random_states(metadata["random"])
+        return metadata["iteration"], metadata["elapsed"]
+
+    def _record(self, obj_pool: np.ndarray):
+        if self.recorder is None:
+            self.evolution_data.append(obj_pool.tolist())
+        else:
+            self.recorder.record(obj_pool)
+
+    def _evaluate(self, runner: SliceRunner, iter: int):
+        """Evaluate the swarm, its penalties and update the personal bests."""
+        with self.profile.phase("evaluation"):
+            runner.run(_evaluate_swarm)
+        with self.profile.phase("penalty"):
+            runner.run(_penalize_swarm, iter)
+        self.profile.count_evaluations(self.num_particles)
+
+    def _swarm_arrays(self) -> dict[str, np.ndarray]:
+        """
+        Swarm state, one row per particle, updated in place by the kernels.
+        """
+        num_objectives = len(self.model._objectives)
+        return {
+            "positions": self._positions,
+            "velocities": self._velocities,
+            "best_positions": self._best_positions,
+            "best_fitness": np.array([p.Pbest_obj for p in self._population]),
+            "cognitive": np.array([p.c1 * p.r1 for p in self._population]),
+            "objectives": np.zeros((self.num_particles, num_objectives)),
+            "violations": np.zeros((self.num_particles, len(self.model._constraints))),
+            "penalties": np.zeros(self.num_particles),
+            "fitness": np.zeros(self.num_particles),
+            "global_best": np.zeros(self.model.num_vars),
+        }
+
     def _has_converged(self, objectives) -> bool:
         objs = [sum(val) for val in objectives]
         min_obj = min(objs)
@@ -269,3 +457,40 @@ class ParticleSwarmOptimizer:
                 return False
 
         return True
+
+
+def _evaluate_swarm(context: dict, swarm: dict, start: int, stop: int):
+    """Evaluate objectives and constraint violations of particles start:stop."""
+    objectives, violations = context["model"].evaluate_population(
+        swarm["positions"][start:stop]
+    )
+    swarm["objectives"][start:stop] = objectives
+    swarm["violations"][start:stop] = violations
+
+
+def _penalize_swarm(context: dict, swarm: dict, start: int, stop: int, iter: int):
+    """Penalize particles start:stop and update their personal bests."""
+    positions = swarm["positions"][start:stop]
+    penalties = iteration_penalties(swarm["violations"][start:stop], iter)
+    fitness = swarm["objectives"][start:stop].sum(axis=1) + penalties
+
+    swarm["penalties"][start:stop] = penalties
+    swarm["fitness"][start:stop] = fitness
+
+    improved = fitness > swarm["best_fitness"][start:stop]
+    swarm["best_fitness"][start:stop][improved] = fitness[improved]
+    swarm["best_positions"][start:stop][improved] = positions[improved]
+
+
+def _move_swarm(context: dict, swarm: dict, start: int, stop: int, theta: float):
+    """Update velocities and positions of particles start:stop."""
+    x = swarm["positions"][start:stop]
+    v = swarm["velocities"][start:stop]
+
+    v[:] = (
+        theta * v
+        + swarm["cognitive"][start:stop, np.newaxis]
+        * (swarm["best_positions"][start:stop] - x)
+        + context["social"] * (swarm["global_best"] - x)
+    )
+    x[:] = context["model"].clip_values(x + v)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+
+class EvolutionFileRecorder:
+    """
+    Records the evolution data of an optimizer, one (population x values)
+    array per iteration, into a ``.npy`` file instead of nested lists.
+
+    Iterations are buffered and appended in chunks. The header, of fixed
+    size, is rewritten after every chunk, so the file is a valid
+    (iterations x population x values) array at any moment and can be
+    opened memory-mapped, even while the run is in progress, with
+    :func:`load_evolution_data`.
+
+    :param path: file to write, overwritten when recording starts
+    :type path: str
+    :param chunk_size: iterations buffered in memory between writes
+    :type chunk_size: int
+    :param dtype: type of the stored values
+    :type dtype: np.dtype
+    """
+
+    _MAGIC = b"\x93NUMPY\x01\x00"
+    _HEADER_SIZE = 128
+
+    def __init__(self, path: str, chunk_size: int = 100, dtype=np.float64) -> None:
+        self.path = path
+        self.chunk_size = max(1, chunk_size)
+        self.dtype = np.dtype(dtype)
+        self.iterations = 0
+
+        self._shape: tuple[int, ...] | None = None
+        self._buffer: list[np.ndarray] = list()
+        self._file = None
+
+    def __len__(self) -> int:
+        return self.iterations + len(self._buffer)
+
+    def __enter__(self) -> EvolutionFileRecorder:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, values):
+        """
+        :param values: objective values and penalty of every candidate
+        :type values: np.ndarray | list[list[float]]
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        if self._shape is None:
+            self._shape = values.shape
+        elif values.shape != self._shape:
+            raise ValueError(
+                f"Expected iterations of shape {self._shape}, got {values.shape}."
+            )
+
+        self._buffer.append(values)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        if self._file is None:
+            # recording again after close appends to the same file
+            mode = "r+b" if self.iterations else "wb"
+            self._file = open(self.path, mode)
+
+        self._file.seek(self._HEADER_SIZE + self.iterations * self._iteration_bytes)
+        self._file.write(np.stack(self._buffer).tobytes())
+        # drops iterations recorded past a checkpoint by an interrupted run
+        self._file.truncate()
+        self.iterations += len(self._buffer)
+        self._buffer.clear()
+
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def dump(self) -> str:
+        """Reference to the recording to be stored in the results file."""
+        self.flush()
+        return os.path.abspath(self.path)
+
+    def checkpoint_state(self) -> tuple[dict[str, np.ndarray], dict]:
+        """The recorded iterations stay in the file, only their count is kept."""
+        self.flush()
+        shape = None if self._shape is None else list(self._shape)
+        return dict(), {"iterations": self.iterations, "shape": shape}
+
+    def restore_checkpoint_state(self, arrays: dict[str, np.ndarray], metadata: dict):
+        """Continue recording into the file after the checkpointed iterations."""
+        self.close()
+        self.iterations = metadata["iterations"]
+        self._shape = None if metadata["shape"] is None else tuple(metadata["shape"])
+
+    @property
+    def _iteration_bytes(self) -> int:
+        return int(np.prod(self._shape)) * self.dtype.itemsize
+
+    def _header(self) -> bytes:
+        shape = (self.iterations,) + tuple(self._shape)
+        description = repr(
+            {"descr": self.dtype.str, "fortran_order": False, "shape": shape}
+        )
+        size = self._HEADER_SIZE - len(self._MAGIC) - 2
+        text = description.ljust(size - 1) + "\n"
+        if len(text) != size:
+            raise ValueError(f"Shape {shape} does not fit the file header.")
+
+        return self._MAGIC + size.to_bytes(2, "little") + text.encode("latin1")
+
+
+def load_evolution_data(path: str) -> np.ndarray:
+    """
+    Open a file written by :class:`EvolutionFileRecorder` memory-mapped.
+
+    :param path: recorded file
+    :type path: str
+    :return: read-only (iterations x population x values) array
+    :rtype: np.ndarray
+    """
+    return np.load(path, mmap_mode="r")
+
+
+class EvolutionSummaryRecorder:
+    """
+    Records summary statistics of every iteration instead of the values of
+    every candidate, using constant memory per iteration.
+
+    For each recorded column (objectives and penalty) and for their sum, the
+    minimum, the ``quantiles``, the maximum and the mean are kept, along with
+    the values of the candidate having the largest sum. The full values are
+    also kept every ``full_every`` iterations, when given.
+
+    :param quantiles: quantiles kept between minimum and maximum
+    :type quantiles: tuple[float, ...]
+    :param full_every: keep all values of every ``full_every``-th iteration
+    :type full_every: int | None
+    """
+
+    def __init__(
+        self,
+        quantiles: tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95),
+        full_every: int | None = None,
+    ) -> None:
+        self.quantiles = tuple(sorted(quantiles))
+        self.full_every = full_every
+        self.iterations = 0
+        self.full_data: dict[int, np.ndarray] = dict()
+
+        self._summaries: list[np.ndarray] = list()
+        self._best: list[np.ndarray] = list()
+
+    def __len__(self) -> int:
+        return self.iterations
+
+    @property
+    def statistics(self) -> list[str]:
+        return ["min"] + [f"q{q:g}" for q in self.quantiles] + ["max", "mean"]
+
+    @property
+    def summaries(self) -> np.ndarray:
+        """(iterations x columns x statistics) array, the sum being the last column."""
+        return np.array(self._summaries)
+
+    @property
+    def best(self) -> np.ndarray:
+        """(iterations x values) values of the best candidate of each iteration."""
+        return np.array(self._best)
+
+    def record(self, values):
+        """
+        :param values: objective values and penalty of every candidate
+        :type values: np.ndarray | list[list[float]]
+        """
+        values = np.asarray(values, dtype=float)
+        table = np.column_stack([values, values.sum(axis=1)])
+
+        with np.errstate(invalid="ignore"):
+            order = np.quantile(table, (0.0,) + self.quantiles + (1.0,), axis=0)
+            mean = table.mean(axis=0)
+        self._summaries.append(np.vstack([order, mean]).T)
+        self._best.append(values[np.argmax(table[:, -1])].copy())
+
+        if self.full_every and self.iterations % self.full_every == 0:
+            self.full_data[self.iterations] = values.copy()
+        self.iterations += 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def checkpoint_state(self) -> tuple[dict[str, np.ndarray], dict]:
+        full_iterations = sorted(self.full_data)
+        arrays = {
+            "summaries": self.summaries,
+            "best": self.best,
+            "full_data": np.array([self.full_data[k] for k in full_iterations]),
+        }
+        return arrays, {"iterations": self.iterations, "full_iterations": full_iterations}
+
+    def restore_checkpoint_state(self, arrays: dict[str, np.ndarray], metadata: dict):
+        self.iterations = metadata["iterations"]
+        self._summaries = list(arrays["summaries"])
+        self._best = list(arrays["best"])
+        self.full_data = dict(zip(metadata["full_iterations"], arrays["full_data"]))
+
+    def dump(self) -> dict:
+        """Summary in a JSON serializable form, understood by the plots."""
+        num_values = self._best[0].shape[0] if self._best else 0
+        return {
+            "summary": {
+                "statistics": self.statistics,
+                "columns": [f"objective_{k}" for k in range(num_values - 1)]
+                + ["penalty", "total"],
+                "values": self.summaries.tolist(),
+                "best": self.best.tolist(),
+                "full_every": self.full_every,
+                "full_data": {
+                    str(iteration): values.tolist()
+                    for iteration, values in self.full_data.items()
+                },
+            }
+        }
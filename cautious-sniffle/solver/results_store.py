@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+
+import numpy as np
+
+from .recording import load_evolution_data
+
+# configuration of a run, as in the names of the results files
+CONFIGURATION = ("max_iterations", "population", "num_vars", "num_constrs")
+
+_FILE_NAME = re.compile(r"\d+it_\d+_ind\d+var_\d+cnstr_(\d+)_(pso|de)\.json$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    source_mtime REAL NOT NULL,
+    algo TEXT NOT NULL,
+    repetition INTEGER,
+    max_iterations INTEGER NOT NULL,
+    population INTEGER NOT NULL,
+    num_vars INTEGER NOT NULL,
+    num_constrs INTEGER NOT NULL,
+    solve_time REAL,
+    objectives TEXT NOT NULL,
+    total_objective REAL NOT NULL,
+    evo_data TEXT,
+    evo_data_kind TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_configuration
+    ON runs (algo, max_iterations, population, num_vars, num_constrs, total_objective);
+"""
+
+
+class ResultsStore:
+    """
+    SQLite index of experiment results files.
+
+    Every results file, as written by ``dump_json_results`` or by the grid
+    runner, is parsed once into a row of run metadata. The evolution data is
+    kept out of line: lists are saved as ``.npy`` files next to the database,
+    files written by a recorder stay where they are, and only the plotted
+    runs load them. Files already ingested and unchanged are skipped, changed
+    ones replace their run, and runs of files that no longer exist are
+    removed.
+
+    :param path: database file
+    :type path: str
+    """
+
+    def __init__(self, path: str = "results/results.sqlite") -> None:
+        self.path = path
+        self.arrays_directory = os.path.splitext(path)[0] + "_arrays"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> ResultsStore:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def ingest(self, directory: str) -> int:
+        """
+        Index the results files of ``directory`` and its subdirectories.
+
+        :return: number of files ingested
+        :rtype: int
+        """
+        known = {
+            row["source"]: row["source_mtime"]
+            for row in self._connection.execute("SELECT source, source_mtime FROM runs")
+        }
+        for source in known:
+            if not os.path.isfile(source):
+                self._delete(source)
+
+        arrays_directory = os.path.abspath(self.arrays_directory)
+        ingested = 0
+        for root, directories, names in os.walk(directory):
+            directories[:] = [
+                name
+                for name in directories
+                if os.path.abspath(os.path.join(root, name)) != arrays_directory
+            ]
+            for name in sorted(names):
+                if not name.endswith(".json"):
+                    continue
+                source = os.path.abspath(os.path.join(root, name))
+                mtime = os.path.getmtime(source)
+                if known.get(source) == mtime:
+                    continue
+
+                with open(source) as f:
+                    data = json.load(f)
+                self._delete(source)
+                if "objectives" not in data:
+                    continue
+                self._insert(source, mtime, name, data)
+                ingested += 1
+
+        self._connection.commit()
+        return ingested
+
+    def _insert(self, source: str, mtime: float, name: str, data: dict):
+        match = _FILE_NAME.search(name)
+        if "run" in data:
+            algo, repetition = data["run"]["optimizer"], data["run"]["seed"]
+        elif match is not None:
+            algo, repetition = match.group(2), int(match.group(1))
+        else:
+            algo, repetition = "pso" if name.endswith("_pso.json") else "de", None
+
+        cursor = self._connection.execute(
+            """
+            INSERT INTO runs (
+                source, source_mtime, algo, repetition, max_iterations,
+                population, num_vars, num_constrs, solve_time, objectives,
+                total_objective
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                source,
+                mtime,
+                algo,
+                repetition,
+                data["max_iterations"],
+                data["population"],
+                data["num_vars"],
+                data["num_constrs"],
+                data["solve_time"],
+                json.dumps(data["objectives"]),
+                float(sum(data["objectives"])),
+            ),
+        )
+
+        evo_data, kind = self._store_evolution_data(cursor.lastrowid, data.get("evo_data"))
+        self._connection.execute(
+            "UPDATE runs SET evo_data = ?, evo_data_kind = ? WHERE id = ?",
+            (evo_data, kind, cursor.lastrowid),
+        )
+
+    def _delete(self, source: str):
+        """Remove the run of a file, with the evolution data saved for it."""
+        arrays_directory = os.path.abspath(self.arrays_directory)
+        for row in self._connection.execute(
+            "SELECT evo_data FROM runs WHERE source = ?", (source,)
+        ).fetchall():
+            # recorder files are not ours to delete
+            path = row["evo_data"]
+            if path is not None and os.path.dirname(path) == arrays_directory:
+                if os.path.isfile(path):
+                    os.remove(path)
+        self._connection.execute("DELETE FROM runs WHERE source = ?", (source,))
+
+    def _store_evolution_data(self, run_id: int, evo_data) -> tuple[str | None, str | None]:
+        if evo_data is None:
+            return None, None
+        if isinstance(evo_data, str):
+            # already in a file written by an EvolutionFileRecorder
+            return evo_data, "npy"
+
+        os.makedirs(self.arrays_directory, exist_ok=True)
+        if isinstance(evo_data, dict):
+            path = os.path.join(self.arrays_directory, f"{run_id}.json")
+            with open(path, "w") as f:
+                json.dump(evo_data, f)
+            return os.path.abspath(path), "summary"
+
+        path = os.path.join(self.arrays_directory, f"{run_id}.npy")
+        np.save(path, np.asarray(evo_data, dtype=float))
+        return os.path.abspath(path), "npy"
+
+    def configurations(self, algo: str) -> list[tuple[int, int, int, int]]:
+        """
+        :return: distinct (iterations, population, variables, constraints)
+            of the runs of an algorithm
+        :rtype: list[tuple[int, int, int, int]]
+        """
+        rows = self._connection.execute(
+            f"SELECT DISTINCT {', '.join(CONFIGURATION)} FROM runs WHERE algo = ?",
+            (algo,),
+        )
+        return [tuple(row) for row in rows]
+
+    def runs(self, algo: str, configuration: tuple) -> list[dict]:
+        rows = self._connection.execute(
+            f"SELECT * FROM runs WHERE algo = ? AND {self._where()} ORDER BY repetition",
+            (algo, *configuration),
+        )
+        return [self._run(row) for row in rows]
+
+    def best_run(self, algo: str, configuration: tuple) -> dict | None:
+        """
+        :return: run of a configuration with the largest sum of objectives,
+            the first one on ties
+        :rtype: dict | None
+        """
+        row = self._connection.execute(
+            f"""
+            SELECT * FROM runs WHERE algo = ? AND {self._where()}
+            ORDER BY total_objective DESC, repetition LIMIT 1
+            """,
+            (algo, *configuration),
+        ).fetchone()
+        return None if row is None else self._run(row)
+
+    def statistics(self, algo: str, configuration: tuple, objective: int = 0) -> dict:
+        """
+        Aggregates of the runs of a configuration, standard deviations being
+        those of the population, as ``np.std``.
+
+        :param objective: index of the objective summarised
+        :type objective: int
+        :return: runs, mean and std of the solve time, min, max, mean and std
+            of the objective
+        :rtype: dict
+        """
+        value = f"json_extract(objectives, '$[{int(objective)}]')"
+        row = self._connection.execute(
+            f"""
+            SELECT
+                COUNT(*) AS runs,
+                AVG(solve_time) AS time_mean,
+                AVG(solve_time * solve_time) AS time_square_mean,
+                MIN({value}) AS objective_min,
+                MAX({value}) AS objective_max,
+                AVG({value}) AS objective_mean,
+                AVG({value} * {value}) AS objective_square_mean
+            FROM runs WHERE algo = ? AND {self._where()}
+            """,
+            (algo, *configuration),
+        ).fetchone()
+
+        statistics = dict(row)
+        for name in ("time", "objective"):
+            mean = statistics[f"{name}_mean"]
+            square_mean = statistics.pop(f"{name}_square_mean")
+            statistics[f"{name}_std"] = (
+                None if mean is None else float(np.sqrt(max(square_mean - mean * mean, 0.0)))
+            )
+        return statistics
+
+    def evolution_data(self, run: dict) -> np.ndarray | dict:
+        """
+        Load the evolution data of a run, memory-mapped when stored as an
+        array.
+        """
+        if run["evo_data_kind"] == "summary":
+            with open(run["evo_data"]) as f:
+                return json.load(f)
+        return load_evolution_data(run["evo_data"])
+
+    @staticmethod
+    def _where() -> str:
+        return " AND ".join(f"{name} = ?" for name in CONFIGURATION)
+
+    @staticmethod
+    def _run(row: sqlite3.Row) -> dict:
+        run = dict(row)
+        run["objectives"] = json.loads(run["objectives"])
+        return run
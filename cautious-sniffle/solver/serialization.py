@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import io
+import operator as op
+import os
+
+import numpy as np
+
+from .expression import Expression
+from .model import Model
+from .sums import LinearSum, Sum
+from .variables import BinVariable, IntVariable, RealVariable, VarType
+
+# bumped whenever the arrays change
+FORMAT_VERSION = 1
+
+# operator of the nodes whose code is its position
+_OPERATORS = (
+    op.add,
+    op.sub,
+    op.mul,
+    op.truediv,
+    op.floordiv,
+    op.pow,
+    op.lt,
+    op.le,
+    op.eq,
+    op.ge,
+    op.gt,
+)
+_OPERATOR_CODES = {operator: code for code, operator in enumerate(_OPERATORS)}
+
+# codes of the other nodes
+_CONSTANT, _VARIABLE, _LINEAR, _SUM = -1, -2, -3, -4
+
+_FLOAT, _INT, _BOOL = 0, 1, 2
+
+_VARIABLE_CLASSES = {
+    VarType.REAL: (0, RealVariable),
+    VarType.INTEGER: (1, IntVariable),
+    VarType.BINARY: (2, BinVariable),
+}
+
+
+def _constant(value) -> tuple[float, int]:
+    if isinstance(value, (bool, np.bool_)):
+        return float(value), _BOOL
+    if isinstance(value, (int, np.integer)):
+        if float(value) != value:
+            raise TypeError(f"Integer constant {value} does not fit a float64.")
+        return float(value), _INT
+    if isinstance(value, (float, np.floating)):
+        return float(value), _FLOAT
+    raise TypeError(f"Constant {value!r} of type {type(value)} cannot be serialized.")
+
+
+def model_arrays(model: Model) -> dict[str, np.ndarray]:
+    """
+    Flat encoding of a model as typed arrays.
+
+    The objectives and nonlinear constraints are stored as the nodes of the
+    model expression graph, in topological order: one code per node, an
+    operator or a node kind, and two operands, child nodes or positions in
+    the constants, linear terms and sum children arrays. Affine
+    constraints are stored as their sparse system, variables as a table of
+    names, types, bounds and values.
+
+    :raises TypeError: for expressions holding objects other than numeric
+        constants, variables and expressions, or unknown operators
+    :rtype: dict[str, np.ndarray]
+    """
+    graph = model.expression_graph
+    nodes = graph._nodes
+
+    codes = np.empty(len(nodes), dtype=np.int8)
+    left = np.zeros(len(nodes), dtype=np.int64)
+    right = np.zeros(len(nodes), dtype=np.int64)
+    constants, constant_types = list(), list()
+    linear_offsets, linear_indexes, linear_coefficients, linear_constants = [0], [], [], []
+    sum_children = list()
+
+    for node, key in enumerate(nodes):
+        kind = key[0]
+        if kind == "const":
+            value, constant_type = _constant(key[2])
+            codes[node], left[node] = _CONSTANT, len(constants)
+            constants.append(value)
+            constant_types.append(constant_type)
+        elif kind == "var":
+            codes[node], left[node] = _VARIABLE, key[1]
+        elif kind == "linear":
+            codes[node], left[node] = _LINEAR, len(linear_constants)
+            linear_indexes.extend(key[1])
+            linear_coefficients.extend(key[2])
+            linear_offsets.append(len(linear_indexes))
+            linear_constants.append(key[3])
+        elif kind == "sum":
+            codes[node] = _SUM
+            left[node] = len(sum_children)
+            sum_children.extend(key[1])
+            right[node] = len(sum_children)
+        elif kind == "opaque":
+            raise TypeError(f"{graph._opaque[key[1]]!r} cannot be serialized.")
+        elif kind in _OPERATOR_CODES:
+            codes[node] = _OPERATOR_CODES[kind]
+            left[node], right[node] = key[1], key[2]
+        else:
+            raise TypeError(f"Operator {kind!r} cannot be serialized.")
+
+    variables = model._indexed_variables
+    matrix, rhs = model.linear_constraints
+    num_objectives = len(model._objectives)
+    constraint_nodes = np.full(len(model._constraints), -1, dtype=np.int64)
+    constraint_nodes[model._nonlinear_rows] = model._graph_outputs[num_objectives:]
+    penalty = np.nan if model._penalty is None else model._penalty
+
+    return {
+        "version": np.array([FORMAT_VERSION]),
+        "codes": codes,
+        "left": left,
+        "right": right,
+        "constants": np.array(constants, dtype=float),
+        "constant_types": np.array(constant_types, dtype=np.int8),
+        "linear_offsets": np.array(linear_offsets, dtype=np.int64),
+        "linear_indexes": np.array(linear_indexes, dtype=np.int64),
+        "linear_coefficients": np.array(linear_coefficients, dtype=float),
+        "linear_constants": np.array(linear_constants, dtype=float),
+        "sum_children": np.array(sum_children, dtype=np.int64),
+        "variable_names": np.array([var.name for var in variables], dtype=str),
+        "variable_types": np.array(
+            [_VARIABLE_CLASSES[var.type][0] for var in variables], dtype=np.int8
+        ),
+        "lower_bounds": model._lower_bounds,
+        "upper_bounds": model._upper_bounds,
+        "values": model._values,
+        "objectives": np.array(model._graph_outputs[:num_objectives], dtype=np.int64),
+        "constraint_nodes": constraint_nodes,
+        "equality": model.equality_rows,
+        "matrix_data": matrix.data,
+        "matrix_indices": matrix.indices,
+        "matrix_indptr": matrix.indptr,
+        "rhs": rhs,
+        "settings": np.array([penalty, model._equality_tolerance]),
+    }
+
+
+def _extensible(expression) -> bool:
+    # extending an expression already extended would copy its steps
+    return isinstance(expression, Expression) and len(expression.a) == expression._length
+
+
+def _expressions(arrays: dict[str, np.ndarray], variables: list) -> list:
+    """
+    Rebuild every node of the encoded graph, in order. Operations on an
+    expression extend its steps, as when it was first built, so that chains
+    of operations do not nest; shared subexpressions become operands.
+    """
+    codes = arrays["codes"].tolist()
+    left = arrays["left"].tolist()
+    right = arrays["right"].tolist()
+    constants = arrays["constants"].tolist()
+    constant_types = arrays["constant_types"].tolist()
+    linear_offsets = arrays["linear_offsets"].tolist()
+    linear_indexes = arrays["linear_indexes"].tolist()
+    linear_coefficients = arrays["linear_coefficients"].tolist()
+    linear_constants = arrays["linear_constants"].tolist()
+    sum_children = arrays["sum_children"].tolist()
+    casts = {_FLOAT: float, _INT: int, _BOOL: bool}
+
+    expressions = list()
+    for node, code in enumerate(codes):
+        if code == _CONSTANT:
+            position = left[node]
+            expression = casts[constant_types[position]](constants[position])
+        elif code == _VARIABLE:
+            expression = variables[left[node]]
+        elif code == _LINEAR:
+            start, stop = linear_offsets[left[node]], linear_offsets[left[node] + 1]
+            expression = LinearSum(
+                [variables[index] for index in linear_indexes[start:stop]],
+                linear_coefficients[start:stop],
+                linear_constants[left[node]],
+            )
+        elif code == _SUM:
+            expression = Sum(
+                [expressions[child] for child in sum_children[left[node] : right[node]]]
+            )
+        else:
+            operator = _OPERATORS[code]
+            a, b = expressions[left[node]], expressions[right[node]]
+            if _extensible(a):
+                expression = a._extend(None, operator, b)
+            elif _extensible(b):
+                expression = b._extend(a, operator, None)
+            else:
+                expression = Expression(a, operator, b)
+        expressions.append(expression)
+
+    return expressions
+
+
+def model_from_arrays(arrays: dict[str, np.ndarray]) -> Model:
+    """
+    Model encoded by :func:`model_arrays`.
+
+    :rtype: Model
+    """
+    version = int(arrays["version"][0])
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format {version}, expected {FORMAT_VERSION}.")
+
+    classes = {code: cls for code, cls in _VARIABLE_CLASSES.values()}
+    variables = list()
+    for name, code, lb, ub in zip(
+        arrays["variable_names"].tolist(),
+        arrays["variable_types"].tolist(),
+        arrays["lower_bounds"].tolist(),
+        arrays["upper_bounds"].tolist(),
+    ):
+        if classes[code] is BinVariable:
+            var = BinVariable(name)
+            var.lb, var.ub = lb, ub
+        else:
+            var = classes[code](name, lb=lb, ub=ub)
+        variables.append(var)
+
+    model = Model()
+    model._register_variables(variables)
+    model._values[:] = arrays["values"]
+
+    expressions = _expressions(arrays, variables)
+    for node in arrays["objectives"].tolist():
+        model.set_objective_x(expressions[node], len(model._objectives))
+
+    indptr = arrays["matrix_indptr"].tolist()
+    indices = arrays["matrix_indices"].tolist()
+    data = arrays["matrix_data"].tolist()
+    rhs = arrays["rhs"].tolist()
+    linear_row = 0
+    for node, equality in zip(
+        arrays["constraint_nodes"].tolist(), arrays["equality"].tolist()
+    ):
+        if node >= 0:
+            constraint = expressions[node]
+        else:
+            start, stop = indptr[linear_row], indptr[linear_row + 1]
+            constraint = LinearSum(
+                [variables[index] for index in indices[start:stop]],
+                data[start:stop],
+                -rhs[linear_row],
+            )
+            linear_row += 1
+        model._insert_constraint(constraint, equality)
+
+    penalty, tolerance = arrays["settings"].tolist()
+    model._penalty = None if np.isnan(penalty) else penalty
+    model._equality_tolerance = tolerance
+    return model
+
+
+def dumps(model: Model) -> bytes:
+    """
+    Models pickle by default through their attributes, which recurses into
+    the expressions; this encoding does not, and suits deep expressions.
+
+    :return: the flat encoding of a model, see :func:`model_arrays`
+    :rtype: bytes
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, **model_arrays(model))
+    return buffer.getvalue()
+
+
+def loads(data: bytes) -> Model:
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        return model_from_arrays(dict(arrays))
+
+
+def save_model(model: Model, path: str):
+    """
+    Write a model to ``path``, an ``.npz`` archive; the file is written
+    aside and renamed, so it is never left half written.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(dumps(model))
+    os.replace(temporary, path)
+
+
+def load_model(path: str) -> Model:
+    with np.load(path, allow_pickle=False) as arrays:
+        return model_from_arrays(dict(arrays))
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import numpy as np
+
+from time import perf_counter
+
+
+class StoppingRules:
+    """
+    Rules ending a run before ``max_iterations``, checked once per iteration
+    against the best fitness found so far, the sum of objectives and penalty
+    the optimizers maximize.
+
+    On stagnation the worst ``restart_fraction`` of the population is
+    replaced by random candidates, up to ``max_restarts`` times, after which
+    stagnation stops the run.
+
+    :param time_limit: wall-clock budget of a call to ``optimize``, in seconds
+    :type time_limit: float | None
+    :param target: stop once the best fitness reaches this value
+    :type target: float | None
+    :param stagnation: iterations without improvement of the best fitness
+        after which the population is restarted or the run stops
+    :type stagnation: int | None
+    :param min_improvement: smallest increase of the best fitness counted as
+        an improvement
+    :type min_improvement: float
+    :param restart_fraction: fraction of the population restarted on
+        stagnation, 0 stops the run instead
+    :type restart_fraction: float
+    :param max_restarts: restarts allowed, None for no limit
+    :type max_restarts: int | None
+    """
+
+    def __init__(
+        self,
+        time_limit: float | None = None,
+        target: float | None = None,
+        stagnation: int | None = None,
+        min_improvement: float = 0.0,
+        restart_fraction: float = 0.0,
+        max_restarts: int | None = None,
+    ) -> None:
+        self.time_limit = time_limit
+        self.target = target
+        self.stagnation = stagnation
+        self.min_improvement = min_improvement
+        self.restart_fraction = float(np.clip(restart_fraction, 0, 1))
+        self.max_restarts = max_restarts
+        self.start()
+
+    def start(self):
+        """Reset the clock and the counters, called when ``optimize`` starts."""
+        self.best = -np.inf
+        self.stagnant = 0
+        self.restarts = 0
+        self.reason: str | None = None
+        self._start_time = perf_counter()
+
+    def state(self) -> dict:
+        return {"best": self.best, "stagnant": self.stagnant, "restarts": self.restarts}
+
+    def restore(self, state: dict):
+        self.best = state["best"]
+        self.stagnant = state["stagnant"]
+        self.restarts = state["restarts"]
+
+    def update(self, best: float):
+        """
+        :param best: best fitness found so far
+        :type best: float
+        """
+        if best > self.best + self.min_improvement:
+            self.best = best
+            self.stagnant = 0
+        else:
+            self.stagnant += 1
+
+    def check(self) -> str | None:
+        """
+        :return: ``"stop"`` when the run should end, its cause being kept in
+            ``reason``, ``"restart"`` when the worst candidates should be
+            replaced, else None
+        :rtype: str | None
+        """
+        if self.time_limit is not None and perf_counter() - self._start_time >= self.time_limit:
+            self.reason = "time_limit"
+            return "stop"
+
+        if self.target is not None and self.best >= self.target:
+            self.reason = "target"
+            return "stop"
+
+        if self.stagnation and self.stagnant >= self.stagnation:
+            if self.restart_fraction > 0 and (
+                self.max_restarts is None or self.restarts < self.max_restarts
+            ):
+                self.restarts += 1
+                self.stagnant = 0
+                return "restart"
+
+            self.reason = "stagnation"
+            return "stop"
+
+        return None
+
+    def worst(self, fitness: np.ndarray) -> np.ndarray:
+        """
+        :param fitness: fitness of every candidate
+        :type fitness: np.ndarray
+        :return: indexes of the candidates to restart, never the best one
+        :rtype: np.ndarray
+        """
+        size = len(fitness)
+        count = min(size - 1, max(1, int(round(self.restart_fraction * size))))
+        fitness = np.nan_to_num(fitness, nan=-np.inf)
+        return np.argsort(fitness, kind="stable")[:count]
@@ -0,0 +1,451 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+import operator as op
+
+from .expression import (
+    Expression,
+    _batched_operation,
+    _evaluate_operand,
+    _is_constant,
+    _operation,
+)
+from .variables import _Variable
+
+
+def _linear_term(term) -> tuple[_Variable, float] | None:
+    """
+    Split ``term`` into (variable, coefficient) when it is a variable or a
+    variable scaled by a constant.
+    """
+    if isinstance(term, _Variable):
+        return term, 1.0
+
+    if not isinstance(term, Expression) or term._length != 1:
+        return None
+
+    left, operator, right = term.a[0], term.op[0], term.b[0]
+    if operator is op.mul:
+        if isinstance(left, _Variable) and _is_constant(right):
+            return left, float(right)
+        if _is_constant(left) and isinstance(right, _Variable):
+            return right, float(left)
+    if operator is op.truediv and isinstance(left, _Variable) and _is_constant(right):
+        if right != 0:
+            return left, 1.0 / right
+
+    return None
+
+
+def quicksum(terms: Iterable):
+    """
+    Sum ``terms`` in linear time.
+
+    Constants and (scaled) variables are gathered into a single
+    :class:`LinearSum`, any other term is kept in an n-ary :class:`Sum`.
+    Terms that are sums themselves are flattened, and a linear part
+    reduced to zero is left out of the :class:`Sum`.
+
+    :param terms: constants, variables or expressions
+    :type terms: Iterable
+    :return: the sum of terms
+    :rtype: LinearSum | Sum
+    """
+    variables = list()
+    coefficients = list()
+    constant = 0.0
+    others = list()
+
+    pending = list(terms)
+    pending.reverse()
+    while pending:
+        term = pending.pop()
+        if _is_constant(term):
+            constant += term
+            continue
+
+        if isinstance(term, LinearSum):
+            variables.extend(term.variables[: term._length])
+            coefficients.extend(term.coefficients[: term._length])
+            constant += term.constant
+            continue
+
+        if isinstance(term, Sum):
+            pending.extend(reversed(term.terms[: term._length]))
+            continue
+
+        linear = _linear_term(term)
+        if linear is None:
+            others.append(term)
+        else:
+            variables.append(linear[0])
+            coefficients.append(linear[1])
+
+    linear_sum = LinearSum(variables, coefficients, constant)
+    if not others:
+        return linear_sum
+    if not variables and constant == 0:
+        return Sum(others)
+
+    return Sum([linear_sum] + others)
+
+
+def affine_form(expression) -> tuple[dict[int, float], float] | None:
+    """
+    Decompose ``expression`` as ``sum(coefficients[i] * x[i]) + constant``.
+
+    :param expression: constant, variable or expression
+    :return: coefficients by variable index and the constant, or ``None``
+        when the expression is not affine in the model variables
+    :rtype: tuple[dict[int, float], float] | None
+    """
+    # operands are decomposed on an explicit stack, deep expressions would
+    # exceed the recursion limit
+    stack = [_affine_steps(expression)]
+    form = None
+    while stack:
+        try:
+            operand = stack[-1].send(form)
+        except StopIteration as done:
+            stack.pop()
+            form = done.value
+            continue
+
+        stack.append(_affine_steps(operand))
+        form = None
+
+    return form
+
+
+def _affine_steps(expression):
+    """
+    Decomposition of ``expression``, yielding each operand it needs and
+    receiving its form back.
+    """
+    if _is_constant(expression):
+        return dict(), float(expression)
+
+    if isinstance(expression, _Variable):
+        if expression.index is None:
+            return None
+        return {expression.index: 1.0}, 0.0
+
+    if isinstance(expression, LinearSum):
+        coefficients = dict()
+        for k in range(expression._length):
+            index = expression.variables[k].index
+            if index is None:
+                return None
+            coefficients[index] = (
+                coefficients.get(index, 0.0) + expression.coefficients[k]
+            )
+        return coefficients, float(expression.constant)
+
+    if isinstance(expression, Sum):
+        result = (dict(), 0.0)
+        for k in range(expression._length):
+            term = yield expression.terms[k]
+            if term is None:
+                return None
+            result = _combine_affine(op.add, result, term)
+        return result
+
+    if isinstance(expression, Expression):
+        result = (dict(), 0.0)
+        for position in range(expression._length):
+            val_a = expression.a[position]
+            val_b = expression.b[position]
+            left = result if val_a is None else (yield val_a)
+            if left is None:
+                return None
+            right = result if val_b is None else (yield val_b)
+            if right is None:
+                return None
+
+            result = _combine_affine(expression.op[position], left, right)
+            if result is None:
+                return None
+        return result
+
+    return None
+
+
+def _combine_affine(operator, left: tuple, right: tuple) -> tuple | None:
+    # forms are built fresh for every operand, so left is updated in place
+    left_coefficients, left_constant = left
+    right_coefficients, right_constant = right
+
+    if operator is op.add or operator is op.sub:
+        sign = 1.0 if operator is op.add else -1.0
+        for index, coef in right_coefficients.items():
+            left_coefficients[index] = left_coefficients.get(index, 0.0) + sign * coef
+        return left_coefficients, left_constant + sign * right_constant
+
+    if not left_coefficients and not right_coefficients:
+        try:
+            value = operator(left_constant, right_constant)
+        except (ZeroDivisionError, OverflowError):
+            return None
+        if not _is_constant(value):
+            return None
+        return dict(), float(value)
+
+    if operator is op.mul and not left_coefficients:
+        factor, coefficients, constant = left_constant, right_coefficients, right_constant
+    elif operator is op.mul and not right_coefficients:
+        factor, coefficients, constant = right_constant, left_coefficients, left_constant
+    elif operator is op.truediv and not right_coefficients and right_constant != 0:
+        factor, coefficients, constant = 1.0 / right_constant, left_coefficients, left_constant
+    else:
+        return None
+
+    return {index: factor * coef for index, coef in coefficients.items()}, factor * constant
+
+
+class _Node:
+    """
+    Arithmetic shared by the n-ary nodes: every operation builds a chained
+    :class:`Expression` having the node as operand, unless it simplifies.
+    """
+
+    def __add__(self, other):
+        return _operation(self, op.add, other)
+
+    def __sub__(self, other):
+        return _operation(self, op.sub, other)
+
+    def __mul__(self, other):
+        return _operation(self, op.mul, other)
+
+    def __truediv__(self, other):
+        return _operation(self, op.truediv, other)
+
+    def __floordiv__(self, other):
+        return _operation(self, op.floordiv, other)
+
+    def __pow__(self, other):
+        return _operation(self, op.pow, other)
+
+    def __lt__(self, other):
+        return Expression(self, op.lt, other)
+
+    def __le__(self, other):
+        return Expression(self, op.le, other)
+
+    def __eq__(self, other):
+        return Expression(self, op.eq, other)
+
+    def __ge__(self, other):
+        return Expression(self, op.ge, other)
+
+    def __gt__(self, other):
+        return Expression(self, op.gt, other)
+
+    def __radd__(self, other):
+        return _operation(other, op.add, self)
+
+    def __rsub__(self, other):
+        return _operation(other, op.sub, self)
+
+    def __rmul__(self, other):
+        return _operation(other, op.mul, self)
+
+    def __rtruediv__(self, other):
+        return _operation(other, op.truediv, self)
+
+    def __rfloordiv__(self, other):
+        return _operation(other, op.floordiv, self)
+
+    def __rpow__(self, other):
+        return _operation(other, op.pow, self)
+
+
+class LinearSum(_Node):
+    """
+    Affine expression ``sum(coefficients[k] * variables[k]) + constant``.
+
+    Like :class:`Expression`, the variables and coefficients lists may be
+    shared with longer sums built from this one; only the first ``_length``
+    entries belong to it.
+    """
+
+    def __init__(
+        self,
+        variables: list[_Variable] | None = None,
+        coefficients: list[float] | None = None,
+        constant: float = 0.0,
+    ) -> None:
+        self.variables = list() if variables is None else variables
+        self.coefficients = list() if coefficients is None else coefficients
+        self.constant = constant
+        self._length = len(self.variables)
+        self._indices: np.ndarray | None = None
+        self._weights: np.ndarray | None = None
+
+    @property
+    def value(self) -> float:
+        return (
+            sum(
+                self.coefficients[k] * self.variables[k].value
+                for k in range(self._length)
+            )
+            + self.constant
+        )
+
+    def evaluate(self, values: np.ndarray) -> np.ndarray:
+        if self._indices is None:
+            self._indices = np.array(
+                [var.index for var in self.variables[: self._length]], dtype=int
+            )
+            self._weights = np.array(self.coefficients[: self._length], dtype=float)
+
+        return values[..., self._indices] @ self._weights + self.constant
+
+    def _append(self, variables: list, coefficients: list, constant: float = 0.0):
+        if len(self.variables) == self._length:
+            own_variables, own_coefficients = self.variables, self.coefficients
+        else:
+            own_variables = self.variables[: self._length]
+            own_coefficients = self.coefficients[: self._length]
+
+        own_variables.extend(variables)
+        own_coefficients.extend(coefficients)
+        return LinearSum(own_variables, own_coefficients, self.constant + constant)
+
+    def _is_zero(self) -> bool:
+        return self._length == 0 and self.constant == 0
+
+    def _scale(self, factor: float) -> LinearSum:
+        return LinearSum(
+            self.variables[: self._length],
+            [factor * coef for coef in self.coefficients[: self._length]],
+            factor * self.constant,
+        )
+
+    def __add__(self, other):
+        if _is_constant(other):
+            return self._append([], [], other)
+
+        if isinstance(other, LinearSum):
+            return self._append(
+                other.variables[: other._length],
+                other.coefficients[: other._length],
+                other.constant,
+            )
+
+        linear = _linear_term(other)
+        if linear is not None:
+            return self._append([linear[0]], [linear[1]])
+
+        if self._is_zero():
+            return other
+        return Sum([self, other])
+
+    def __sub__(self, other):
+        if _is_constant(other):
+            return self._append([], [], -other)
+
+        if isinstance(other, LinearSum):
+            return self + other._scale(-1.0)
+
+        linear = _linear_term(other)
+        if linear is not None:
+            return self._append([linear[0]], [-linear[1]])
+
+        if self._is_zero():
+            return -1 * other
+        return Sum([self, -1 * other])
+
+    def __mul__(self, other):
+        # products by zero are kept, as for expressions: inf * 0 is nan
+        if _is_constant(other) and other != 0:
+            return self._scale(other)
+        return _operation(self, op.mul, other)
+
+    def __truediv__(self, other):
+        if _is_constant(other) and other != 0:
+            return self._scale(1.0 / other)
+        return _operation(self, op.truediv, other)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __rsub__(self, other):
+        return self._scale(-1.0) + other
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __repr__(self) -> str:
+        terms = [
+            f"{self.coefficients[k]} * {self.variables[k]}" for k in range(self._length)
+        ]
+        if self.constant != 0 or not terms:
+            terms.append(f"{self.constant}")
+        return "(" + " + ".join(terms) + ")"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+
+class Sum(_Node):
+    """
+    N-ary sum of arbitrary terms, evaluated in one pass over the terms.
+
+    The terms list may be shared with longer sums built from this one; only
+    the first ``_length`` terms belong to it.
+    """
+
+    def __init__(self, terms: list) -> None:
+        self.terms = terms
+        self._length = len(terms)
+
+    @property
+    def value(self):
+        result = 0
+        for position in range(self._length):
+            term = self.terms[position]
+            try:
+                result = result + term.value
+            except AttributeError:
+                result = result + term
+
+        return result
+
+    def evaluate(self, values: np.ndarray):
+        result = 0
+        for position in range(self._length):
+            term_value = _evaluate_operand(self.terms[position], values)
+            result = _batched_operation(op.add, result, term_value)
+
+        return result
+
+    def _append(self, term) -> Sum:
+        if len(self.terms) == self._length:
+            terms = self.terms
+        else:
+            terms = self.terms[: self._length]
+
+        terms.append(term)
+        return Sum(terms)
+
+    def __add__(self, other):
+        if _is_constant(other) and other == 0:
+            return self
+        return self._append(other)
+
+    def __sub__(self, other):
+        if _is_constant(other):
+            return self + (-other)
+        return self._append(-1 * other)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __repr__(self) -> str:
+        return "(" + " + ".join(str(self.terms[k]) for k in range(self._length)) + ")"
+
+    def __str__(self) -> str:
+        return self.__repr__()
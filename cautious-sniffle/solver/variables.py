@@ -8,7 +8,7 @@ import random as rd
 
 from enum import Enum, auto
 
-from .expression import Expression
+from .expression import Expression, _operation
 
 
 class VarType(Enum):
@@ -29,13 +29,35 @@ class _Variable:
         self.lb = lb if lb is not None else sys.float_info.min
         self.ub = ub if ub is not None else sys.float_info.max
 
-        self._value: float | int = 0 if self.lb <= 0 and self.ub >= 0 else self.lb
+        self.index: int | None = None
+        self._slot = 0
+        self._state = np.array([0 if self.lb <= 0 and self.ub >= 0 else self.lb], dtype=float)
         self.type = None
 
+    @property
+    def _value(self) -> float:
+        return self._state[self._slot]
+
+    @_value.setter
+    def _value(self, v):
+        self._state[self._slot] = v
+
     @property
     def value(self) -> int | float:
         return self._value
 
+    def bind(self, state: np.ndarray, index: int):
+        """
+        Store the variable value at ``state[index]``, the values array of the
+        model that owns it.
+        """
+        self.index = index
+        self._slot = index
+        self._state = state
+
+    def evaluate(self, values: np.ndarray) -> np.ndarray:
+        return values[..., self.index]
+
     def set_value(self, v):
         self._value = np.clip(v, self.lb, self.ub)
 
@@ -51,7 +73,8 @@ class _Variable:
     def __setattr__(self, name, value):
         if name == "value":
             self._value = np.clip(value, self.lb, self.ub)
-        self.__dict__[name] = value
+            return
+        object.__setattr__(self, name, value)
 
     def __hash__(self) -> int:
         return hash(self.name)
@@ -65,22 +88,22 @@ class _Variable:
         return f"{self.name}"
 
     def __add__(self, other):
-        return Expression(self, op.add, other)
+        return _operation(self, op.add, other)
 
     def __sub__(self, other):
-        return Expression(self, op.sub, other)
+        return _operation(self, op.sub, other)
 
     def __mul__(self, other):
-        return Expression(self, op.mul, other)
+        return _operation(self, op.mul, other)
 
     def __truediv__(self, other):
-        return Expression(self, op.truediv, other)
+        return _operation(self, op.truediv, other)
 
     def __floordiv__(self, other):
-        return Expression(self, op.floordiv, other)
+        return _operation(self, op.floordiv, other)
 
     def __pow__(self, other):
-        return Expression(self, op.pow, other)
+        return _operation(self, op.pow, other)
 
     def __lt__(self, other):
         return Expression(self, op.lt, other)
@@ -98,22 +121,22 @@ class _Variable:
         return Expression(self, op.gt, other)
 
     def __radd__(self, other):
-        return Expression(other, op.add, self)
+        return _operation(other, op.add, self)
 
     def __rsub__(self, other):
-        return Expression(other, op.sub, self)
+        return _operation(other, op.sub, self)
 
     def __rmul__(self, other):
-        return Expression(other, op.mul, self)
+        return _operation(other, op.mul, self)
 
     def __rtruediv__(self, other):
-        return Expression(other, op.truediv, self)
+        return _operation(other, op.truediv, self)
 
     def __rfloordiv__(self, other):
-        return Expression(other, op.floordiv, self)
+        return _operation(other, op.floordiv, self)
 
     def __rpow__(self, other):
-        return Expression(other, op.pow, self)
+        return _operation(other, op.pow, self)
 
     def __rlt__(self, other):
         return Expression(other, op.lt, self)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from .model import Model
+from .serialization import dumps, loads
+
+# state of a worker process, set once by _initialize_worker
+_worker_context = None
+_worker_arrays: dict[str, np.ndarray] = dict()
+_worker_memories: list[shared_memory.SharedMemory] = list()
+
+
+class SharedArrays:
+    """
+    Copies of numpy arrays placed in shared memory, so that worker processes
+    read and update them in place instead of pickling them.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        self._memories: dict[str, shared_memory.SharedMemory] = dict()
+        self.arrays: dict[str, np.ndarray] = dict()
+
+        try:
+            for name, array in arrays.items():
+                memory = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                self._memories[name] = memory
+                shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+                shared[...] = array
+                self.arrays[name] = shared
+        except BaseException:
+            self.release()
+            raise
+
+    @property
+    def spec(self) -> dict[str, tuple[str, tuple, str]]:
+        return {
+            name: (self._memories[name].name, array.shape, array.dtype.str)
+            for name, array in self.arrays.items()
+        }
+
+    def copy_to(self, arrays: dict[str, np.ndarray]):
+        for name, array in arrays.items():
+            array[...] = self.arrays[name]
+
+    def release(self):
+        # views must be dropped before the memory can be closed
+        self.arrays.clear()
+        for memory in self._memories.values():
+            memory.close()
+            memory.unlink()
+        self._memories.clear()
+
+
+class _EncodedModel:
+    """
+    Model sent to the workers as its flat encoding, default pickling
+    recurses into the expressions and fails on deep ones.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+
+def _encode_context(context):
+    if isinstance(context, dict):
+        return {name: _encode_context(value) for name, value in context.items()}
+    if isinstance(context, Model):
+        try:
+            return _EncodedModel(dumps(context))
+        except TypeError:
+            # expressions holding objects the encoding does not support
+            return context
+    return context
+
+
+def _decode_context(context):
+    if isinstance(context, dict):
+        return {name: _decode_context(value) for name, value in context.items()}
+    if isinstance(context, _EncodedModel):
+        return loads(context.data)
+    return context
+
+
+def _initialize_worker(context, spec: dict[str, tuple[str, tuple, str]]):
+    global _worker_context
+    _worker_context = _decode_context(context)
+
+    for name, (memory_name, shape, dtype) in spec.items():
+        memory = shared_memory.SharedMemory(name=memory_name)
+        _worker_memories.append(memory)
+        _worker_arrays[name] = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _run_task(task):
+    function, start, stop, args = task
+    function(_worker_context, _worker_arrays, start, stop, *args)
+
+
+class SliceRunner:
+    """
+    Runs kernels ``function(context, arrays, start, stop, *args)`` over the
+    rows of a set of arrays.
+
+    With more than one worker, a pool of processes is started on entering the
+    context and lives until it exits. Each worker receives the context once
+    and attaches to shared memory copies of the arrays, models in the context
+    being sent as their flat encoding; the rows are split in fixed slices,
+    one task per slice, so only the kernel arguments are pickled on every
+    run. On exit the shared arrays are copied back.
+
+    :param context: read-only data needed by the kernels, e.g. the model
+    :param arrays: arrays updated by the kernels, sharing the number of rows
+    :type arrays: dict[str, np.ndarray]
+    :param size: number of rows to split between workers
+    :type size: int
+    :param workers: number of worker processes, 1 runs in-process
+    :type workers: int
+    """
+
+    def __init__(self, context, arrays: dict[str, np.ndarray], size: int, workers: int = 1) -> None:
+        self.context = context
+        self.workers = max(1, min(workers, size))
+        self.size = size
+        self.arrays = arrays
+
+        self._source_arrays = arrays
+        self._shared: SharedArrays | None = None
+        self._pool = None
+
+        bounds = np.linspace(0, size, self.workers + 1).astype(int)
+        self._slices = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def __enter__(self) -> SliceRunner:
+        if self.workers > 1:
+            self._shared = SharedArrays(self._source_arrays)
+            self.arrays = self._shared.arrays
+            try:
+                self._pool = Pool(
+                    self.workers,
+                    initializer=_initialize_worker,
+                    initargs=(_encode_context(self.context), self._shared.spec),
+                )
+            except BaseException:
+                # __exit__ is not called when entering fails
+                self._shared.release()
+                self._shared = None
+                self.arrays = self._source_arrays
+                raise
+        return self
+
+    def run(self, function, *args):
+        if self._pool is None:
+            function(self.context, self.arrays, 0, self.size, *args)
+            return
+
+        self._pool.map(
+            _run_task,
+            [(function, start, stop, args) for start, stop in self._slices],
+            chunksize=1,
+        )
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._pool is not None:
+            if exc_type is None:
+                self._pool.close()
+            else:
+                self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+        if self._shared is not None:
+            self._shared.copy_to(self._source_arrays)
+            self._shared.release()
+            self._shared = None
+            self.arrays = self._source_arrays
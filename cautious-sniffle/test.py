@@ -18,6 +18,9 @@ DE_POPULATION = 1_000
 PSO_ITERATIONS = 10_000
 DE_ITERATIONS = 10_000
 
+# simplifica as restrições antes de otimizar
+PRESOLVE = False
+
 
 def create_test_model():
     start_time = time()
@@ -50,6 +53,13 @@ def create_test_model():
 
 if __name__ == "__main__":
     model, gen_time = create_test_model()
+    if PRESOLVE:
+        presolve = model.presolve()
+        print(
+            f"Presolve removed {len(presolve['removed'])} constraints, "
+            f"tightened {len(presolve['tightened'])} bounds, "
+            f"{len(presolve['infeasible'])} constraints cannot be satisfied"
+        )
 
     print("\nModel Statistics:")
     print(f"{len(model._variables)} variables")